@@ -18,7 +18,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['numpy'],  # Only the headless batch calculator uses numpy
     noarchive=False,
     optimize=0,
 )
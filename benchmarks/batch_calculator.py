@@ -0,0 +1,83 @@
+"""
+Parity check of BatchInvoiceCalculator against the scalar InvoiceCalculator
+over randomized portfolios, with timings.
+
+Run from the repository root:
+
+    python -m benchmarks.batch_calculator
+"""
+import sys
+import random
+import time
+from decimal import Decimal
+from src.calculations.invoice_calculator import InvoiceCalculator
+from src.calculations.batch_calculator import BatchInvoiceCalculator
+
+def random_portfolios(rng, count):
+    """(invoices, params) with float device values, as the calculators received them originally"""
+    invoices = []
+    params = []
+    for index in range(count):
+        devices = [
+            {
+                'Device ID': f"DEV{index}-{d}",
+                'Capacity': rng.choice([0.5, 1, 1.5, 2.99, 3, 12.5]),
+                'TotalIssued': round(rng.uniform(0, 5000), 4),
+            }
+            for d in range(rng.randint(0, 40))
+        ]
+        registered = {device['Device ID'] for device in devices if rng.random() < 0.5}
+        remove = rng.random() < 0.1
+        invoices.append((devices, registered))
+        params.append((round(rng.uniform(0.1, 5), 4), 0 if remove else round(rng.uniform(0, 20), 4),
+                       round(rng.uniform(70, 90), 4), round(rng.uniform(80, 100), 4), remove))
+    return invoices, params
+
+def random_decimal_portfolios(rng, count):
+    """(invoices, params) with Decimal device values as MySQL returns them: 3-place capacities, 4-place issuance"""
+    invoices = []
+    params = []
+    for index in range(count):
+        devices = [
+            {
+                'Device ID': f"DEV{index}-{d}",
+                'Capacity': Decimal(rng.randint(1, 25000)).scaleb(-3),
+                'TotalIssued': Decimal(rng.randint(0, 50000000)).scaleb(-4),
+            }
+            for d in range(rng.randint(0, 60))
+        ]
+        registered = {device['Device ID'] for device in devices if rng.random() < 0.5}
+        remove = rng.random() < 0.1
+        invoices.append((devices, registered))
+        params.append((Decimal(f"{rng.uniform(0.1, 5):.4f}"), 0 if remove else Decimal(f"{rng.uniform(0, 20):.4f}"),
+                       Decimal(f"{rng.uniform(70, 90):.4f}"), Decimal(f"{rng.uniform(80, 100):.4f}"), remove))
+    return invoices, params
+
+def check(label, invoices, params):
+    start = time.perf_counter()
+    expected = [
+        InvoiceCalculator.calculate_invoice_amounts(devices, registered, *invoice_params)
+        for (devices, registered), invoice_params in zip(invoices, params)
+    ]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = BatchInvoiceCalculator.calculate_many(invoices, *zip(*params))
+    batch_time = time.perf_counter() - start
+
+    mismatches = [i for i, (a, b) in enumerate(zip(actual, expected)) if a != b]
+    print(f"{label}: {len(invoices)} invoices: scalar {scalar_time * 1000:.1f} ms, batch {batch_time * 1000:.1f} ms")
+    print(f"{label}: mismatches: {len(mismatches)}")
+    for i in mismatches[:5]:
+        print(f"  invoice {i}: scalar {expected[i]} batch {actual[i]}")
+    return len(mismatches)
+
+def main():
+    invoices, params = random_portfolios(random.Random(20240101), 500)
+    mismatches = check("float inputs", invoices, params)
+    invoices, params = random_decimal_portfolios(random.Random(20240102), 3000)
+    mismatches += check("Decimal inputs", invoices, params)
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+"""
+Benchmark: invoices written per second by ExcelInvoiceGenerator.
+
+Run from the repository root:
+
+    python -m benchmarks.excel_invoices [template.xlsx] [count]
+"""
+import os
+import sys
+import tempfile
+import time
+from src.utils.excel_handler import ExcelInvoiceGenerator, load_invoice_template
+
+def main():
+    template_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join('src', 'public', 'template.xlsx')
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    data = {
+        'company_name': 'Benchmark Company Ltd', 'pan': 'ABCDE1234F', 'gst': '33ABCDE1234F1Z0',
+        'address': 'No. 1, Main Road, Area, City, State, 600001',
+        'period_from': 'January', 'period_to': 'March', 'project': '10 MW Solar Project', 'year': '2024'
+    }
+    calculations = {'total_issued': 20028.63, 'net_rate': 51.68124}
+
+    start = time.perf_counter()
+    load_invoice_template(template_path)
+    print(f"Template load: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        for i in range(count):
+            generator = ExcelInvoiceGenerator(template_path)
+            generator.generate_invoice(data, calculations)
+            generator.save(os.path.join(output_dir, f"invoice_{i}.xlsx"))
+        elapsed = time.perf_counter() - start
+    print(f"{count} invoices in {elapsed:.2f} s: {count / elapsed:.1f} invoices/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Fetch one PAN's invoice data in the pivot and long modes of
+get_invoice_data, check they agree and time them.
+
+Run from the repository root against the configured database:
+
+    python -m benchmarks.invoice_fetch_modes ABCDE1234F --year 2023 --from April --to March --year-to 2024
+"""
+import argparse
+import time
+from src.database.query import get_devices_by_pan, get_invoice_data
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the pivot and long invoice fetch modes")
+    parser.add_argument("pan", help="PAN whose devices are fetched")
+    parser.add_argument("--year", type=int, required=True)
+    parser.add_argument("--from", dest="period_from", default="January")
+    parser.add_argument("--to", dest="period_to", default="December")
+    parser.add_argument("--year-to", type=int)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    device_ids = get_devices_by_pan(args.pan)
+    results = {}
+    for mode in ("pivot", "long"):
+        get_invoice_data(device_ids, args.year, args.period_from, args.period_to, args.year_to, mode=mode)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            results[mode] = get_invoice_data(device_ids, args.year, args.period_from, args.period_to,
+                                             args.year_to, mode=mode)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        print(f"{mode}: {len(results[mode])} rows in {elapsed * 1000:.1f} ms per fetch")
+
+    pivot_rows, long_rows = (
+        {(row["Device ID"], row["Project"]): row for row in results[mode]} for mode in ("pivot", "long")
+    )
+    mismatches = [key for key in pivot_rows.keys() | long_rows.keys() if pivot_rows.get(key) != long_rows.get(key)]
+    print(f"{len(device_ids)} devices, mismatches: {len(mismatches)}")
+    for key in mismatches[:5]:
+        print(f"  {key}: pivot {pivot_rows.get(key)} long {long_rows.get(key)}")
+
+if __name__ == "__main__":
+    main()
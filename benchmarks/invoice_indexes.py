@@ -0,0 +1,90 @@
+"""
+Check that create_invoice_indexes() gives the invoice query an index plan.
+
+Builds inventory2 in a throwaway SQLite file, prints the EXPLAIN QUERY
+PLAN of the statement get_invoice_data runs before and after
+create_invoice_indexes(), and exits non-zero unless the plan afterwards
+uses idx_inventory2_device_year_month.
+
+Run from the repository root:
+
+    python -m benchmarks.invoice_indexes
+    python -m benchmarks.invoice_indexes --year 2023 --from April --to March --year-to 2024
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from sqlalchemy import text, bindparam
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the invoice query plan uses the invoice indexes")
+    parser.add_argument("--devices", type=int, default=500, help="Number of devices in inventory2")
+    parser.add_argument("--year", type=int, default=2024, help="First year of the checked period")
+    parser.add_argument("--from", dest="period_from", default="January", help="First month of the period")
+    parser.add_argument("--to", dest="period_to", default="December", help="Last month of the period")
+    parser.add_argument("--year-to", type=int, help="Year of the last month, for a period into the next year")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # The engine reads DATABASE_URL when it is first created
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(temp_dir, 'indexes.db')}"
+        from src.database.db_connection import get_session, get_engine
+        from src.database.query import (get_period_months, _invoice_data_statement,
+                                        _period_shape, _period_year_params)
+        from src.database.migrations import create_invoice_indexes
+
+        rng = random.Random(4)
+        device_ids = [f"BENCH-{i:05d}" for i in range(args.devices)]
+        with get_session() as db:
+            db.execute(text("""
+                CREATE TABLE inventory2 (
+                    `Device ID` VARCHAR(255), Project VARCHAR(255), `Capacity (MW)` DECIMAL(10, 3),
+                    Year INTEGER, Month VARCHAR(20), Issued DECIMAL(16, 4), issue_process TEXT,
+                    invoice_status VARCHAR(5), PAN VARCHAR(20)
+                )
+            """))
+            db.execute(
+                text("INSERT INTO inventory2 VALUES (:device_id, 'Project', 1.5, :year, :month, :issued, NULL, 'False', :pan)"),
+                [
+                    {"device_id": device_id, "year": year, "month": month,
+                     "issued": round(rng.uniform(0, 100), 4), "pan": f"PAN{index // 10:04d}"}
+                    for index, device_id in enumerate(device_ids)
+                    for year in range(args.year - 1, (args.year_to or args.year) + 2)
+                    for month in MONTHS
+                ]
+            )
+            db.commit()
+
+        period_months = get_period_months(args.year, args.period_from, args.period_to, args.year_to)
+        statement = _invoice_data_statement(*_period_shape(period_months))
+        explain = text(f"EXPLAIN QUERY PLAN {statement.text}").bindparams(bindparam("device_ids", expanding=True))
+        params = {"device_ids": device_ids[:20], **_period_year_params(period_months)}
+
+        def query_plan():
+            with get_session() as db:
+                return [row[-1] for row in db.execute(explain, params)]
+
+        print("Before:")
+        for detail in query_plan():
+            print(f"  {detail}")
+        created = create_invoice_indexes()
+        print(f"Created indexes: {', '.join(created) if created else 'none'}")
+        plan = query_plan()
+        print("After:")
+        for detail in plan:
+            print(f"  {detail}")
+        get_engine().dispose()
+
+    if not any("idx_inventory2_device_year_month" in detail for detail in plan):
+        print("FAIL: the invoice query does not use idx_inventory2_device_year_month")
+        return 1
+    print("OK: the invoice query uses idx_inventory2_device_year_month")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
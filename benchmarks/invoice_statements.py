@@ -0,0 +1,78 @@
+"""
+Statement construction and compilation cost per get_invoice_data call,
+before and after the pivot statement cache.
+
+Run from the repository root:
+
+    python -m benchmarks.invoice_statements
+"""
+import random
+import time
+from sqlalchemy import text
+from sqlalchemy.dialects import mysql
+from src.database.query import (MONTHS, get_month_key, get_month_variants, get_period_months,
+                                _invoice_data_statement, _period_shape, get_statement_cache_stats)
+
+def original_statement(period_months):
+    """The get_invoice_data statement as it was built before the statement cache"""
+    month_sums = []
+    month_issue_process = []
+    for year, month in period_months:
+        literals = ", ".join(f"'{variant}'" for variant in get_month_variants([month]))
+        condition = f"Year = {int(year)} AND Month IN ({literals})"
+        key = get_month_key(year, month)
+        month_sums.append(f"SUM(CASE WHEN {condition} THEN Issued ELSE 0 END) AS `{key}Issued`")
+        month_issue_process.append(f"MAX(CASE WHEN {condition} THEN issue_process ELSE NULL END) AS `{key}IssueProcess`")
+    months_by_year = {}
+    for year, month in period_months:
+        months_by_year.setdefault(year, []).append(month)
+    clauses = [f"(Year = :year_{i} AND Month IN :months_{i})" for i in range(len(months_by_year))]
+    return text(f"""
+        SELECT `Device ID`, `Project`, MIN(`Capacity (MW)`) AS Capacity, SUM(Issued) AS TotalIssued,
+            {", ".join(month_sums)},
+            {", ".join(month_issue_process)}
+        FROM inventory2
+        WHERE `Device ID` IN :device_ids AND ({" OR ".join(clauses)}) AND Issued > 0 AND invoice_status = 'False'
+        GROUP BY `Device ID`, `Project`
+    """)
+
+def main():
+    dialect = mysql.dialect()
+    rng = random.Random(24)
+    periods = []
+    for _ in range(2000):
+        year = rng.randint(2022, 2025)
+        start = rng.randrange(12)
+        end = rng.randrange(start, start + 24)
+        year_to, end_index = year + end // 12, end % 12
+        periods.append(get_period_months(year, MONTHS[start], MONTHS[end_index], year_to))
+
+    # Before: every call builds the SQL and, as its text differs per year, compiles it again
+    build_time = compile_time = 0.0
+    for period_months in periods:
+        start = time.perf_counter()
+        query = original_statement(period_months)
+        build_time += time.perf_counter() - start
+        start = time.perf_counter()
+        query.compile(dialect=dialect)
+        compile_time += time.perf_counter() - start
+    print(f"before: build {build_time / len(periods) * 1e6:.1f} us, compile {compile_time / len(periods) * 1e6:.1f} us per call")
+
+    # After: one statement per month-range shape; the engine compiles each shape once and
+    # afterwards only derives its cache key to find the compiled form
+    compiled = {}
+    lookup_time = compile_time = 0.0
+    for period_months in periods:
+        start = time.perf_counter()
+        query = _invoice_data_statement(*_period_shape(period_months))
+        lookup_time += time.perf_counter() - start
+        start = time.perf_counter()
+        cache_key = query._generate_cache_key().key
+        if cache_key not in compiled:
+            compiled[cache_key] = query.compile(dialect=dialect)
+        compile_time += time.perf_counter() - start
+    print(f"after:  build {lookup_time / len(periods) * 1e6:.1f} us, compile {compile_time / len(periods) * 1e6:.1f} us per call"
+          f" ({len(compiled)} shapes compiled, {get_statement_cache_stats()})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark: Decimal rounding and calculator throughput on a large portfolio.
+
+Run from the repository root:
+
+    python -m benchmarks.money
+"""
+import random
+import time
+from decimal import Decimal
+from src.calculations.money import MONEY_CONTEXT, quantize
+from src.calculations.invoice_calculator import InvoiceCalculator
+
+def main():
+    rng = random.Random(7)
+    values = [Decimal(f"{rng.uniform(0, 1e6):.6f}") for _ in range(200000)]
+
+    start = time.perf_counter()
+    for value in values:
+        value.quantize(Decimal('0.0001'), context=MONEY_CONTEXT)
+    uncached = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for value in values:
+        quantize(value)
+    cached = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for value in values:
+        round(float(value), 4)
+    floats = time.perf_counter() - start
+    print(f"{len(values)} roundings: float {floats * 1000:.1f} ms, "
+          f"Decimal uncached {uncached * 1000:.1f} ms, Decimal cached {cached * 1000:.1f} ms")
+
+    invoices = [
+        [
+            {'Device ID': f"DEV{i}-{d}", 'Capacity': Decimal(rng.choice(['0.5', '1.5', '3', '12.5'])),
+             'TotalIssued': Decimal(f"{rng.uniform(0, 5000):.4f}")}
+            for d in range(rng.randint(1, 40))
+        ]
+        for i in range(2000)
+    ]
+    start = time.perf_counter()
+    for invoice_data in invoices:
+        InvoiceCalculator.calculate_invoice_amounts(invoice_data, set(), 1.25, 10, 83.5, 90.25)
+    elapsed = time.perf_counter() - start
+    print(f"{len(invoices)} invoices calculated in {elapsed * 1000:.1f} ms: {len(invoices) / elapsed:.0f} invoices/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Check of convert_to_words against the original recursive implementation
+over random and edge-case amounts, with timings.
+
+Run from the repository root:
+
+    python -m benchmarks.number_to_words
+"""
+import sys
+import random
+import time
+from src.utils.number_to_words import convert_to_words, convert_many
+
+def original_convert_to_words(amount):
+    crore = 10000000
+    lakh = 100000
+    thousand = 1000
+    hundred = 100
+
+    units = ["", "ONE", "TWO", "THREE", "FOUR", "FIVE", "SIX", "SEVEN", "EIGHT", "NINE", "TEN",
+             "ELEVEN", "TWELVE", "THIRTEEN", "FOURTEEN", "FIFTEEN", "SIXTEEN", "SEVENTEEN", "EIGHTEEN", "NINETEEN"]
+    tens = ["", "", "TWENTY", "THIRTY", "FORTY", "FIFTY", "SIXTY", "SEVENTY", "EIGHTY", "NINETY"]
+
+    def convert_number_to_words(num):
+        if num < 20:
+            return units[num]
+        if num < 100:
+            return tens[num // 10] + (" " + units[num % 10] if num % 10 != 0 else "")
+        if num < thousand:
+            return units[num // hundred] + " HUNDRED" + (" AND " + convert_number_to_words(num % hundred) if num % hundred != 0 else "")
+        if num < lakh:
+            return convert_number_to_words(num // thousand) + " THOUSAND" + (" " + convert_number_to_words(num % thousand) if num % thousand != 0 else "")
+        if num < crore:
+            return convert_number_to_words(num // lakh) + " LAKH" + (" " + convert_number_to_words(num % lakh) if num % lakh != 0 else "")
+        return convert_number_to_words(num // crore) + " CRORE" + (" " + convert_number_to_words(num % crore) if num % crore != 0 else "")
+
+    amount_str = "{:.2f}".format(float(amount))
+    rupees, paise = amount_str.split('.')
+    result = convert_number_to_words(int(rupees))
+    result += " RUPEES"
+    paise_val = int(paise)
+    if paise_val > 0:
+        result += " AND " + convert_number_to_words(paise_val) + " PAISE"
+    return result + " ONLY"
+
+def main():
+    rng = random.Random(17)
+    amounts = [0, 0.01, 0.99, 1, 19.5, 20, 99.99, 100, 101, 999.99, 1000, 100000, 10000000,
+               99999999.99, 10 ** 12 + 0.5]
+    amounts += [rng.randint(0, 10 ** rng.randint(1, 12)) + rng.randint(0, 99) / 100 for _ in range(100000)]
+
+    mismatches = [amount for amount in amounts if convert_to_words(amount) != original_convert_to_words(amount)]
+    print(f"Checked {len(amounts)} amounts, mismatches: {len(mismatches)}")
+    for amount in mismatches[:5]:
+        print(f"  {amount!r}: {original_convert_to_words(amount)!r} != {convert_to_words(amount)!r}")
+
+    start = time.perf_counter()
+    for amount in amounts:
+        original_convert_to_words(amount)
+    original_time = time.perf_counter() - start
+    start = time.perf_counter()
+    convert_many(amounts)
+    table_time = time.perf_counter() - start
+    print(f"original {original_time * 1000:.1f} ms, table-driven {table_time * 1000:.1f} ms")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+Headless batch invoicing for whole seller groups.
+
+Runs the same pipeline as the Generate / Confirm and Download buttons for
+every seller in a group, without Qt:
+
+    python src/batch.py --group "Group A" --year 2024 --from January --to March \
+        --usd-rate 83.1 --eur-rate 90.2
+
+A period that runs into the next year takes --year-to, e.g. a financial
+year: --year 2023 --from April --year-to 2024 --to March.
+
+Partial issues are billed at their default (full) value, as the modal
+preselects in the GUI.
+"""
+import sys
+import os
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from nanoid import generate
+from src.database.db_connection import get_pool_stats
+from src.database.query import get_group_invoice_data, get_registered_devices, commit_invoice
+from src.database.sellers_cache import sellers_cache
+from src.calculations.invoice_calculator import InvoiceCalculator
+from src.calculations.batch_calculator import BatchInvoiceCalculator
+from src.calculations.money import to_decimal
+from src.utils.invoice_payload import build_invoice_record, build_excel_data, get_project_text
+from src.utils.invoice_renderer import render_invoices
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TEMPLATE_PATH = os.path.join(project_root, "src", "public", "template.xlsx")
+
+def process_seller(group_name, seller_info, invoice_data, year, period_from, period_to,
+                   usd_rate, eur_rate, remove_fees=False, worksheets=False, year_to=None,
+                   calculations=None):
+    """Calculate and record the invoice for a single seller's prefetched invoice data
+
+    calculations may be passed in when they were already computed for the
+    seller, as run_batch does for all sellers at once. Returns the seller's
+    result with a render job for the invoice file (and the worksheet PDF
+    when worksheets is set).
+    """
+    company_name = seller_info["seller"]
+    result = {"group": group_name, "company": company_name, "status": "skipped", "path": None}
+
+    if not seller_info["pan"]:
+        result["reason"] = "no PAN"
+        return result
+
+    if not invoice_data:
+        result["reason"] = "no uninvoiced issuance in period"
+        return result
+
+    device_ids = [device['Device ID'] for device in invoice_data]
+    registered_devices = get_registered_devices(device_ids)
+    unregistered_devices = [d for d in device_ids if d not in registered_devices]
+
+    unit_price = to_decimal(seller_info["indicative_price"])
+    success_fee = 0 if remove_fees else to_decimal(seller_info["success_fee"])
+    if calculations is None:
+        calculations = InvoiceCalculator.calculate_invoice_amounts(
+            invoice_data,
+            registered_devices,
+            unit_price,
+            success_fee,
+            usd_rate,
+            eur_rate,
+            remove_fees
+        )
+
+    project_text = get_project_text(invoice_data)
+    invoice_record = build_invoice_record(
+        generate(size=21),
+        group_name,
+        company_name,
+        seller_info,
+        calculations,
+        device_ids,
+        unregistered_devices,
+        unit_price,
+        usd_rate,
+        eur_rate,
+        year,
+        period_from,
+        period_to,
+        project_text,
+        year_to
+    )
+    commit_invoice(invoice_record, invoice_data, year, period_from, period_to, year_to=year_to)
+
+    result.update({
+        "status": "ok",
+        "invoice_id": invoice_record['invoiceid'],
+        "job": {
+            'group_name': group_name,
+            'company_name': company_name,
+            'year': year,
+            'excel_data': build_excel_data(company_name, seller_info, period_from, period_to, project_text, year, year_to),
+            'calculations': calculations,
+            'invoice_data': invoice_data if worksheets else None,
+        }
+    })
+    return result
+
+def run_batch(groups, year, period_from, period_to, usd_rate, eur_rate,
+              remove_fees=False, workers=4, output_root=None, render_workers=None,
+              worksheets=False, year_to=None):
+    """Invoice every seller of the given groups (None for all) and return per-seller results"""
+    # The sellers table is only re-read when its checksum differs from the snapshot
+    sellers_cache.load_snapshot()
+    sellers_cache.refresh()
+    sellers_data = sellers_cache.as_dict()
+    if groups:
+        missing = [group for group in groups if group not in sellers_data]
+        if missing:
+            raise ValueError(f"Unknown group(s): {', '.join(missing)}")
+    else:
+        groups = sorted(sellers_data.keys())
+
+    # One set-based query per group instead of one per seller
+    jobs = []
+    for group_name in groups:
+        group_data = get_group_invoice_data(sellers_data[group_name], year, period_from, period_to, year_to)
+        # Warm the registration cache for the whole group with one lookup
+        get_registered_devices(row['Device ID'] for rows in group_data.values() for row in rows)
+        for seller_info in sellers_data[group_name]:
+            jobs.append((group_name, seller_info, group_data.get(seller_info["pan"], [])))
+    logger.info(f"Invoicing {len(jobs)} sellers across {len(groups)} group(s) with {workers} workers")
+
+    # Amounts of every seller with something to invoice, in one columnar pass
+    billable = [i for i, (_, seller_info, invoice_data) in enumerate(jobs) if seller_info["pan"] and invoice_data]
+    calculations = dict(zip(billable, BatchInvoiceCalculator.calculate_many(
+        [(jobs[i][2], get_registered_devices(row['Device ID'] for row in jobs[i][2])) for i in billable],
+        [to_decimal(jobs[i][1]["indicative_price"]) for i in billable],
+        [0 if remove_fees else to_decimal(jobs[i][1]["success_fee"]) for i in billable],
+        usd_rate,
+        eur_rate,
+        remove_fees
+    )))
+
+    def run_job(job, job_calculations):
+        group_name, seller_info, invoice_data = job
+        try:
+            return process_seller(group_name, seller_info, invoice_data, year, period_from, period_to,
+                                  usd_rate, eur_rate, remove_fees, worksheets, year_to, job_calculations)
+        except Exception as e:
+            logger.error(f"Failed to invoice {seller_info['seller']}: {str(e)}")
+            return {"group": group_name, "company": seller_info["seller"],
+                    "status": "failed", "path": None, "reason": str(e)}
+
+    # Database round trips dominate, so threads are enough to overlap them
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(run_job, jobs, map(calculations.get, range(len(jobs)))))
+
+    # Rendering is CPU-bound, so committed invoices are written on a process pool
+    committed = [result for result in results if result["status"] == "ok"]
+    rendered = render_invoices([result.pop("job") for result in committed],
+                               TEMPLATE_PATH, output_root, render_workers)
+    for result, render_result in zip(committed, rendered):
+        result["path"] = render_result["path"]
+        result["worksheet_path"] = render_result["worksheet_path"]
+        if render_result["status"] != "ok":
+            # The invoice is already recorded; only its file needs regenerating
+            result.update({"status": "failed", "reason": f"saved but not rendered: {render_result['reason']}"})
+
+    for status in ("ok", "skipped", "failed"):
+        logger.info(f"{status}: {sum(1 for r in results if r['status'] == status)}")
+    logger.info(f"Pool stats: {get_pool_stats()}")
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate invoices for whole seller groups without the GUI")
+    parser.add_argument("--group", action="append", dest="groups",
+                        help="Group to invoice (repeatable); omit to invoice all groups")
+    parser.add_argument("--year", type=int, required=True)
+    parser.add_argument("--from", dest="period_from", required=True, help="First month, e.g. January")
+    parser.add_argument("--to", dest="period_to", required=True, help="Last month, e.g. March")
+    parser.add_argument("--year-to", type=int, default=None, help="Year of the last month (default: --year)")
+    parser.add_argument("--usd-rate", type=to_decimal, required=True, help="USD exchange rate")
+    parser.add_argument("--eur-rate", type=to_decimal, required=True, help="EUR exchange rate")
+    parser.add_argument("--remove-fees", action="store_true", help="Waive registration, issuance and success fees")
+    parser.add_argument("--workers", type=int, default=4, help="Number of worker threads")
+    parser.add_argument("--render-workers", type=int, default=None,
+                        help="Number of rendering processes (default: one per CPU)")
+    parser.add_argument("--worksheets", action="store_true", help="Also write the worksheet PDF for each invoice")
+    parser.add_argument("--output-dir", default=None, help="Root directory for Invoices/ (default: cwd)")
+    args = parser.parse_args(argv)
+
+    results = run_batch(
+        args.groups,
+        args.year,
+        args.period_from.capitalize(),
+        args.period_to.capitalize(),
+        args.usd_rate,
+        args.eur_rate,
+        args.remove_fees,
+        args.workers,
+        args.output_dir,
+        args.render_workers,
+        args.worksheets,
+        args.year_to
+    )
+
+    for result in results:
+        detail = result["path"] if result["status"] == "ok" else result.get("reason", "")
+        print(f"{result['status']:8} {result['group']} / {result['company']}: {detail}")
+
+    return 1 if any(r["status"] == "failed" for r in results) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
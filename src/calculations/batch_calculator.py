@@ -0,0 +1,214 @@
+import numpy as np
+from itertools import chain, repeat
+from operator import itemgetter
+from decimal import Decimal, Inexact, localcontext
+from .money import ZERO, AMOUNT_PLACES, CAPACITY_PLACES, to_decimal
+from .invoice_calculator import ISSUANCE_FEE_RATE
+
+# Largest magnitude a column's scaled units may sum to and still be added in int64
+INT64_SUM_LIMIT = 2 ** 63
+# Below this many units a value's double, scaled by an exact power of ten, rounds back to its units
+FLOAT_UNITS_LIMIT = 2 ** 50
+# Powers of ten up to 10**22 are exact doubles
+MAX_FLOAT_PLACES = 22
+# Precision of the exact sums of device values and of a column's decimal places
+MAX_SUM_DIGITS = 60
+
+ONE = Decimal(1)
+THREE = Decimal(3)
+
+get_device_id = itemgetter('Device ID')
+get_capacity = itemgetter('Capacity')
+get_total_issued = itemgetter('TotalIssued')
+
+class BatchInvoiceCalculator:
+    """Columnar counterpart of InvoiceCalculator for many invoices at once
+
+    Devices of all invoices are laid out as flat arrays with an invoice
+    index per device. Device values stay Decimal and are summed per invoice
+    exactly with np.add.at. From there every per-invoice value is held in
+    fixed point, an integer count of units of the column's finest decimal
+    place, and the money amounts are exact integer products on per-invoice
+    arrays, each rounded once, half-up, to the places
+    InvoiceCalculator.calculate_amounts_from_totals quantizes to. Every
+    figure therefore matches InvoiceCalculator.calculate_invoice_amounts.
+    """
+
+    @staticmethod
+    def decimal_places(decimals):
+        """Finest number of decimal places among the values"""
+        # An exact Decimal sum carries the smallest exponent of its terms
+        with localcontext() as context:
+            context.prec = MAX_SUM_DIGITS
+            context.traps[Inexact] = True
+            try:
+                return max(0, -sum(decimals, ZERO).as_tuple().exponent)
+            except Inexact:
+                return max([0] + [-decimal.as_tuple().exponent for decimal in decimals])
+
+    @staticmethod
+    def to_fixed_point(values):
+        """Scale values to integers in units of their finest decimal place; returns (units, places)
+
+        Units are int64 unless their sum could overflow it, in which case
+        they stay Python integers in an object array.
+        """
+        if not set(map(type, values)) <= {Decimal}:
+            values = list(map(to_decimal, values))
+        places = BatchInvoiceCalculator.decimal_places(values)
+        floats = np.fromiter(map(float, values), dtype=np.float64, count=len(values))
+        largest = float(np.abs(floats).max(initial=0)) * 10.0 ** places
+        if places <= MAX_FLOAT_PLACES and largest < FLOAT_UNITS_LIMIT and largest * len(values) < INT64_SUM_LIMIT:
+            # Every value is a whole number of units, so the scaled double rounds to it exactly
+            units = np.rint(floats * 10.0 ** places).astype(np.int64)
+        else:
+            units = np.array([int(value.scaleb(places)) for value in values] or [0], dtype=object)[:len(values)]
+        return units, places
+
+    @staticmethod
+    def round_half_up(numerators, denominators):
+        """Divide integer arrays, rounding half away from zero like ROUND_HALF_UP"""
+        quotients = (2 * np.abs(numerators) + denominators) // (2 * denominators)
+        return np.where(numerators < 0, -quotients, quotients)
+
+    @staticmethod
+    def rescale(units, places, to_places):
+        """Fixed-point units at places as units at to_places, rounded half-up when dropping places"""
+        if to_places >= places:
+            return units * 10 ** (to_places - places)
+        return BatchInvoiceCalculator.round_half_up(units, 10 ** (places - to_places))
+
+    @staticmethod
+    def calculate_registration_fees(capacities):
+        """Registration fee tier for each capacity"""
+        return np.where(capacities >= THREE, 1000, np.where(capacities > ONE, 500, 100))
+
+    @staticmethod
+    def to_decimal_column(values):
+        """Values as an object array of Decimals"""
+        if not set(map(type, values)) <= {Decimal}:
+            values = list(map(to_decimal, values))
+        return np.fromiter(values, dtype=object, count=len(values))
+
+    @staticmethod
+    def build_columns(invoices):
+        """Flatten (invoice_data, registered_devices) pairs into columnar arrays"""
+        devices = list(chain.from_iterable(invoice_data for invoice_data, _ in invoices))
+        registered = chain.from_iterable(
+            map((registered_devices or set()).__contains__, map(get_device_id, invoice_data))
+            for invoice_data, registered_devices in invoices
+        )
+        return {
+            'invoice_count': len(invoices),
+            'device_counts': np.fromiter(map(len, map(itemgetter(0), invoices)), dtype=np.intp, count=len(invoices)),
+            'capacity': BatchInvoiceCalculator.to_decimal_column(list(map(get_capacity, devices))),
+            'issued': BatchInvoiceCalculator.to_decimal_column(list(map(get_total_issued, devices))),
+            'registered': np.fromiter(registered, dtype=bool, count=len(devices)),
+        }
+
+    @staticmethod
+    def calculate_invoice_amounts(columns, unit_sale_prices, success_fee_percents,
+                                  usd_rates, eur_rates, remove_fees=False):
+        """Calculate the amounts of every invoice in columns
+
+        Rates may be scalars or one value per invoice. Returns one dict per
+        invoice, shaped like InvoiceCalculator.calculate_invoice_amounts.
+        """
+        count = columns['invoice_count']
+        total_devices = columns['device_counts']
+        # Devices are grouped by invoice, so each invoice is a contiguous run
+        starts = np.cumsum(total_devices) - total_devices
+        invoiced = total_devices > 0
+        rescale = BatchInvoiceCalculator.rescale
+
+        def per_invoice(values, dtype=object):
+            return np.broadcast_to(np.asarray(values, dtype=dtype), (count,))
+
+        def fixed_per_invoice(values):
+            if np.ndim(values) == 0:
+                units, places = BatchInvoiceCalculator.to_fixed_point([values])
+                return int(units[0]), places
+            units, places = BatchInvoiceCalculator.to_fixed_point(list(values))
+            return units.astype(object), places
+
+        def sum_per_invoice(values):
+            totals = np.zeros(count, dtype=values.dtype)
+            if invoiced.any():
+                totals[invoiced] = np.add.reduceat(values, starts[invoiced])
+            return totals
+
+        # Money is multiplied out in Python integers, which cannot overflow
+        unit_sale_prices, price_places = fixed_per_invoice(unit_sale_prices)
+        success_fee_percents, percent_places = fixed_per_invoice(success_fee_percents)
+        usd_rates, usd_places = fixed_per_invoice(usd_rates)
+        eur_rates, eur_places = fixed_per_invoice(eur_rates)
+        fee_rate, fee_rate_places = BatchInvoiceCalculator.to_fixed_point([ISSUANCE_FEE_RATE])
+        fee_rate = int(fee_rate[0])
+        keep_fees = ~per_invoice(remove_fees, dtype=bool)
+
+        # Per-invoice totals, summed exactly in Decimal and then taken to fixed point
+        with localcontext() as context:
+            context.prec = MAX_SUM_DIGITS
+            total_capacity, capacity_places = fixed_per_invoice(sum_per_invoice(columns['capacity']))
+            total_issued, issued_places = fixed_per_invoice(sum_per_invoice(columns['issued']))
+        total_issued = rescale(total_issued, issued_places, AMOUNT_PLACES)
+
+        # Registration fee only for unregistered devices of invoices that keep their fees
+        device_fees = BatchInvoiceCalculator.calculate_registration_fees(columns['capacity'])
+        charged = ~columns['registered'] & np.repeat(keep_fees, total_devices)
+        registration_fee = sum_per_invoice(np.where(charged, device_fees, 0).astype(np.int64)).astype(object)
+
+        # Exact amounts, each at the places its factors add up to
+        issuance_places = AMOUNT_PLACES + fee_rate_places
+        issuance_fee = np.where(keep_fees, total_issued * fee_rate, 0)
+        gross_places = AMOUNT_PLACES + price_places + usd_places
+        gross_amount = total_issued * unit_sale_prices * usd_rates
+        reg_fee_inr = registration_fee * eur_rates
+        issuance_fee_inr_places = issuance_places + eur_places
+        issuance_fee_inr = issuance_fee * eur_rates
+        net_places = max(gross_places, eur_places, issuance_fee_inr_places)
+        net_revenue = (rescale(gross_amount, gross_places, net_places)
+                       - rescale(reg_fee_inr, eur_places, net_places)
+                       - rescale(issuance_fee_inr, issuance_fee_inr_places, net_places))
+        # The percentage is divided by 100 by adding two places
+        final_places = net_places + percent_places + 2
+        success_fee = np.where(keep_fees, success_fee_percents * net_revenue, 0)
+        final_revenue = rescale(net_revenue, net_places, final_places) - success_fee
+        issued = total_issued > 0
+        net_rate = np.where(issued, BatchInvoiceCalculator.round_half_up(
+            final_revenue * 10 ** (2 * AMOUNT_PLACES),
+            np.where(issued, total_issued, 1) * 10 ** final_places
+        ), 0)
+
+        # Round each amount once, as calculate_amounts_from_totals quantizes it
+        def amounts(units, places, to_places=AMOUNT_PLACES):
+            return map(Decimal.scaleb, map(Decimal, rescale(units, places, to_places).tolist()), repeat(-to_places))
+
+        return [
+            dict(zip(('capacity', 'total_devices', 'total_issued', 'registration_fee', 'issuance_fee',
+                      'gross_amount', 'reg_fee_inr', 'issuance_fee_inr', 'net_revenue', 'success_fee',
+                      'final_revenue', 'net_rate'), invoice))
+            for invoice in zip(
+                amounts(total_capacity, capacity_places, CAPACITY_PLACES),
+                total_devices.tolist(),
+                amounts(total_issued, AMOUNT_PLACES),
+                amounts(registration_fee, 0, 2),
+                amounts(issuance_fee, issuance_places),
+                amounts(gross_amount, gross_places),
+                amounts(reg_fee_inr, eur_places),
+                amounts(issuance_fee_inr, issuance_fee_inr_places),
+                amounts(net_revenue, net_places),
+                amounts(success_fee, final_places),
+                amounts(final_revenue, final_places),
+                amounts(net_rate, AMOUNT_PLACES),
+            )
+        ]
+
+    @staticmethod
+    def calculate_many(invoices, unit_sale_prices, success_fee_percents,
+                       usd_rates, eur_rates, remove_fees=False):
+        """Calculate amounts for a list of (invoice_data, registered_devices) pairs"""
+        columns = BatchInvoiceCalculator.build_columns(invoices)
+        return BatchInvoiceCalculator.calculate_invoice_amounts(
+            columns, unit_sale_prices, success_fee_percents, usd_rates, eur_rates, remove_fees
+        )
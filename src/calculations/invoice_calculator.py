@@ -1,3 +1,8 @@
+from decimal import Decimal, localcontext
+from .money import MONEY_CONTEXT, ZERO, CAPACITY_PLACES, to_decimal, quantize
+
+ISSUANCE_FEE_RATE = Decimal('0.025')
+
 class InvoiceCalculator:
     @staticmethod
     def calculate_registration_fee(capacity):
@@ -13,47 +18,75 @@ class InvoiceCalculator:
     def calculate_invoice_amounts(invoice_data, registered_devices, unit_sale_price, 
                                 success_fee_percent, usd_rate, eur_rate, remove_fees=False):
         """Calculate all invoice amounts"""
-        # Split registered and unregistered devices
-        registered = set(registered_devices.split(',')) if registered_devices else set()
+        total_capacity, total_devices, total_issued, registration_fee = InvoiceCalculator.calculate_totals(
+            invoice_data, registered_devices
+        )
+        return InvoiceCalculator.calculate_amounts_from_totals(
+            total_capacity, total_devices, total_issued, 0 if remove_fees else registration_fee,
+            unit_sale_price, success_fee_percent, usd_rate, eur_rate, remove_fees
+        )
+
+    @staticmethod
+    def calculate_totals(invoice_data, registered_devices):
+        """Return (total capacity, device count, total issued, registration fee) over the devices"""
+        # Registered devices as a set (a comma-separated string is still accepted)
+        if isinstance(registered_devices, str):
+            registered = set(registered_devices.split(',')) if registered_devices else set()
+        else:
+            registered = registered_devices or set()
         
-        total_capacity = 0
-        total_issued = 0
+        total_capacity = ZERO
+        total_issued = ZERO
         registration_fee = 0
         
         # Process each device
         for device in invoice_data:
             device_id = device['Device ID']
-            capacity = float(device['Capacity'])
-            issued = float(device['TotalIssued'])
+            capacity = to_decimal(device['Capacity'])
+            issued = to_decimal(device['TotalIssued'])
             
             total_capacity += capacity
             total_issued += issued
             
-            # Calculate registration fee only for unregistered devices and if fees are not removed
-            if not remove_fees and device_id not in registered:
+            # Registration fee only for unregistered devices
+            if device_id not in registered:
                 registration_fee += InvoiceCalculator.calculate_registration_fee(capacity)
         
-        # Calculate all amounts
-        issuance_fee = 0.025 * total_issued if not remove_fees else 0
-        gross_amount = total_issued * unit_sale_price * usd_rate
-        reg_fee_inr = registration_fee * eur_rate if not remove_fees else 0
-        issuance_fee_inr = issuance_fee * eur_rate if not remove_fees else 0
-        net_revenue = gross_amount - (reg_fee_inr + issuance_fee_inr)
-        success_fee = (success_fee_percent / 100) * net_revenue if not remove_fees else 0
-        final_revenue = net_revenue - success_fee
-        net_rate = final_revenue / total_issued if total_issued > 0 else 0
+        return total_capacity, len(invoice_data), total_issued, registration_fee
+
+    @staticmethod
+    def calculate_amounts_from_totals(total_capacity, total_devices, total_issued, registration_fee,
+                                      unit_sale_price, success_fee_percent, usd_rate, eur_rate,
+                                      remove_fees=False):
+        """Calculate all invoice amounts from the per-invoice device totals"""
+        with localcontext(MONEY_CONTEXT):
+            # Amounts are derived from the invoiced quantity as it is reported
+            total_issued = quantize(total_issued)
+            unit_sale_price = to_decimal(unit_sale_price)
+            usd_rate = to_decimal(usd_rate)
+            eur_rate = to_decimal(eur_rate)
+
+            # Calculate all amounts
+            issuance_fee = ISSUANCE_FEE_RATE * total_issued if not remove_fees else ZERO
+            gross_amount = total_issued * unit_sale_price * usd_rate
+            reg_fee_inr = registration_fee * eur_rate if not remove_fees else ZERO
+            issuance_fee_inr = issuance_fee * eur_rate if not remove_fees else ZERO
+            net_revenue = gross_amount - (reg_fee_inr + issuance_fee_inr)
+            success_fee = (to_decimal(success_fee_percent) / 100) * net_revenue if not remove_fees else ZERO
+            final_revenue = net_revenue - success_fee
+            net_rate = final_revenue / total_issued if total_issued > 0 else ZERO
         
         return {
-            'capacity': round(total_capacity, 2),
-            'total_devices': len(invoice_data),
-            'total_issued': round(total_issued, 4),
-            'registration_fee': round(registration_fee, 2),
-            'issuance_fee': round(issuance_fee, 4),
-            'gross_amount': round(gross_amount, 4),
-            'reg_fee_inr': round(reg_fee_inr, 4),
-            'issuance_fee_inr': round(issuance_fee_inr, 4),
-            'net_revenue': round(net_revenue, 4),
-            'success_fee': round(success_fee, 4),
-            'final_revenue': round(final_revenue, 4),
-            'net_rate': round(net_rate, 4)
-        } 
\ No newline at end of file
+            'capacity': quantize(total_capacity, CAPACITY_PLACES),
+            'total_devices': total_devices,
+            'total_issued': total_issued,
+            'registration_fee': quantize(registration_fee, 2),
+            'issuance_fee': quantize(issuance_fee),
+            'gross_amount': quantize(gross_amount),
+            'reg_fee_inr': quantize(reg_fee_inr),
+            'issuance_fee_inr': quantize(issuance_fee_inr),
+            'net_revenue': quantize(net_revenue),
+            'success_fee': quantize(success_fee),
+            'final_revenue': quantize(final_revenue),
+            'net_rate': quantize(net_rate)
+        }
@@ -0,0 +1,50 @@
+"""
+Decimal money arithmetic shared by the calculator, the Excel writer and the preview.
+
+Amounts are Decimals end to end: inputs are converted once with to_decimal,
+arithmetic runs in MONEY_CONTEXT and results are rounded half-up with
+quantizers that are built once per number of places.
+"""
+from decimal import Decimal, Context, ROUND_HALF_UP
+from functools import lru_cache
+
+MONEY_CONTEXT = Context(prec=28, rounding=ROUND_HALF_UP)
+
+ZERO = Decimal(0)
+GST_RATE = Decimal('0.09')  # Each of CGST and SGST
+
+AMOUNT_PLACES = 4
+CAPACITY_PLACES = 2
+WORDS_PLACES = 2
+
+@lru_cache(maxsize=None)
+def quantizer(places):
+    """Exponent used to round to the given number of decimal places, e.g. 4 -> 0.0001"""
+    return Decimal(1).scaleb(-places)
+
+def to_decimal(value):
+    """Convert a database, spin-box or text value to Decimal without float noise"""
+    if isinstance(value, Decimal):
+        return value
+    if value is None:
+        return ZERO
+    if isinstance(value, int):
+        return Decimal(value)
+    if isinstance(value, float):
+        return Decimal(repr(value))  # Shortest repr, so 0.1 stays 0.1
+    return Decimal(str(value).strip() or 0)
+
+def quantize(value, places=AMOUNT_PLACES):
+    """Round a value half-up to the given number of decimal places"""
+    return to_decimal(value).quantize(quantizer(places), context=MONEY_CONTEXT)
+
+def format_amount(value, places=AMOUNT_PLACES):
+    """Format a value with exactly the given number of decimal places"""
+    return f"{quantize(value, places):f}"
+
+def gst_breakdown(total_issued, net_rate):
+    """Return (taxable value, CGST, SGST, invoice total) for an invoice"""
+    taxable = quantize(MONEY_CONTEXT.multiply(to_decimal(total_issued), to_decimal(net_rate)))
+    gst = quantize(MONEY_CONTEXT.multiply(taxable, GST_RATE))
+    total = MONEY_CONTEXT.add(taxable, MONEY_CONTEXT.add(gst, gst))
+    return taxable, gst, gst, total
@@ -1,6 +1,8 @@
 import os
-from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
+import time
+import threading
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 import logging
@@ -9,33 +11,141 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables from .env file
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-load_dotenv(dotenv_path=os.path.join(project_root, '.env'))
 
-# Get DATABASE_URL from environment variable
-DATABASE_URL = os.getenv('DATABASE_URL')
+# Pool settings, overridable from .env for month-end batch runs; read when the engine is created
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+POOL_TIMEOUT = 30
+POOL_RECYCLE = 1800
+# Only ping a pooled connection if it sat idle for longer than this (seconds)
+PING_AFTER_IDLE = 300
 
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable is not set")
-
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# The engine is created on first use, so importing this module stays cheap
+_engine = None
+_engine_lock = threading.Lock()
+_settings_loaded = False
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 Base = declarative_base()
 
-def get_db():
+_stats_lock = threading.Lock()
+_pool_stats = {
+    "checkouts": 0,
+    "pings": 0,
+    "invalidated": 0,
+    "total_wait": 0.0,
+    "max_wait": 0.0,
+}
+
+def load_settings():
+    """Load environment variables from the project's .env file once"""
+    global _settings_loaded
+    if not _settings_loaded:
+        from dotenv import load_dotenv
+        load_dotenv(dotenv_path=os.path.join(project_root, '.env'))
+        _settings_loaded = True
+
+def get_engine():
+    """Return the shared engine, loading .env and creating it on first call"""
+    global _engine, POOL_SIZE, MAX_OVERFLOW, POOL_TIMEOUT, POOL_RECYCLE, PING_AFTER_IDLE
+    if _engine is not None:
+        return _engine
+    with _engine_lock:
+        if _engine is not None:
+            return _engine
+
+        load_settings()
+
+        # Get DATABASE_URL from environment variable
+        database_url = os.getenv('DATABASE_URL')
+        if not database_url:
+            raise ValueError("DATABASE_URL environment variable is not set")
+
+        POOL_SIZE = int(os.getenv('DB_POOL_SIZE', str(POOL_SIZE)))
+        MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', str(MAX_OVERFLOW)))
+        POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', str(POOL_TIMEOUT)))
+        POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', str(POOL_RECYCLE)))
+        PING_AFTER_IDLE = int(os.getenv('DB_PING_AFTER_IDLE', str(PING_AFTER_IDLE)))
+
+        engine = create_engine(
+            database_url,
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+            pool_recycle=POOL_RECYCLE,
+        )
+        event.listen(engine, "checkin", _on_checkin)
+        event.listen(engine, "checkout", _on_checkout)
+        SessionLocal.configure(bind=engine)
+        _engine = engine
+        return _engine
+
+def _on_checkin(dbapi_connection, connection_record):
+    connection_record.info["last_checkin"] = time.monotonic()
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    """Ping the connection only if it has been idle long enough to have gone stale"""
+    last_checkin = connection_record.info.get("last_checkin")
+    if last_checkin is None or time.monotonic() - last_checkin < PING_AFTER_IDLE:
+        return
+
+    with _stats_lock:
+        _pool_stats["pings"] += 1
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SELECT 1")
+    except Exception as e:
+        logger.warning(f"Stale pooled connection discarded: {str(e)}")
+        with _stats_lock:
+            _pool_stats["invalidated"] += 1
+        # The pool retries the checkout with a fresh connection
+        raise exc.DisconnectionError() from e
+    finally:
+        cursor.close()
+
+@contextmanager
+def get_session():
+    """Yield a pooled session, rolling back on error and returning it to the pool"""
+    get_engine()
     db = SessionLocal()
     try:
-        # Try to execute a simple query to check the connection
-        db.execute(text("SELECT 1"))
-        logger.info("Database connected successfully")
+        start = time.perf_counter()
+        db.connection()
+        wait = time.perf_counter() - start
+        with _stats_lock:
+            _pool_stats["checkouts"] += 1
+            _pool_stats["total_wait"] += wait
+            _pool_stats["max_wait"] = max(_pool_stats["max_wait"], wait)
         yield db
     except Exception as e:
-        logger.error(f"Database connection failed: {str(e)}")
+        logger.error(f"Database operation failed: {str(e)}")
+        db.rollback()
         raise
     finally:
         db.close()
 
+def get_db():
+    """Generator form of get_session, kept for existing callers"""
+    with get_session() as db:
+        yield db
+
+def get_pool_stats():
+    """Return pool occupancy and checkout wait statistics"""
+    pool = get_engine().pool
+    with _stats_lock:
+        stats = dict(_pool_stats)
+    stats["avg_wait"] = stats["total_wait"] / stats["checkouts"] if stats["checkouts"] else 0.0
+    stats.update({
+        "pool_size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "status": pool.status(),
+    })
+    return stats
+
 # Test the connection
 if __name__ == "__main__":
-    db = next(get_db())
\ No newline at end of file
+    with get_session() as db:
+        logger.info("Database connected successfully")
+    logger.info(f"Pool stats: {get_pool_stats()}")
@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict
+
+# PANs whose device lists are kept, and how long a list is trusted before asking the database again
+DEVICE_CACHE_SIZE = 256
+DEVICE_CACHE_TTL = 300
+
+class DeviceListCache:
+    """Thread-safe, bounded LRU cache of device ID lists keyed by PAN, with expiry"""
+
+    def __init__(self, maxsize=DEVICE_CACHE_SIZE, ttl=DEVICE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # PAN -> (time stored, device IDs)
+        self._stats = {"lookups": 0, "hits": 0, "expired": 0, "evicted": 0}
+
+    def get(self, pan):
+        """Return the cached device IDs for pan, or None if missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            self._stats["lookups"] += 1
+            entry = self._entries.get(pan)
+            if entry is None:
+                return None
+            stored, devices = entry
+            if now - stored > self.ttl:
+                del self._entries[pan]
+                self._stats["expired"] += 1
+                return None
+            self._entries.move_to_end(pan)
+            self._stats["hits"] += 1
+            return list(devices)
+
+    def missing(self, pans):
+        """Return the PANs that have no fresh entry, without counting lookups"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                pan for pan in pans
+                if pan not in self._entries or now - self._entries[pan][0] > self.ttl
+            ]
+
+    def store(self, pan, devices):
+        with self._lock:
+            self._entries[pan] = (time.monotonic(), tuple(devices))
+            self._entries.move_to_end(pan)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats["evicted"] += 1
+
+    def invalidate(self, pan=None):
+        """Drop one PAN's entry, or every entry"""
+        with self._lock:
+            if pan is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(pan, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            return stats
+
+device_cache = DeviceListCache()
@@ -0,0 +1,88 @@
+"""
+Client-side pivot of the long-format invoice rows.
+
+get_invoice_data(..., mode="long") fetches one narrow row per inventory2
+row instead of letting the database pivot the months with CASE
+expressions. This module turns those rows into a device x month matrix.
+benchmarks/invoice_fetch_modes.py compares both modes on real data.
+"""
+from ..utils.issue_process import parse_issue_process
+
+class InvoiceMatrix:
+    """Uninvoiced issuance of a period as a (device, project) x month matrix
+
+    Rows follow GROUP BY `Device ID`, `Project` of the pivot query and
+    columns follow the period months. The matrices are plain lists of rows
+    and Issued values keep the database types (Decimal on MySQL), so sums
+    match SUM() exactly.
+    """
+
+    def __init__(self, period_months, month_keys):
+        self.period_months = period_months
+        self.month_keys = month_keys
+        self._columns = {(year, month): i for i, (year, month) in enumerate(period_months)}
+        self.device_ids = []
+        self.projects = []
+        self.capacity = []
+        self._rows = {}  # (device ID, project) -> row index
+        self._issued = []
+        self._issue_process = []
+
+    @classmethod
+    def from_rows(cls, rows, period_months, month_keys):
+        """Pivot (device, project, year, month, capacity, issued, issue_process) rows"""
+        matrix = cls(period_months, month_keys)
+        for row in rows:
+            matrix.add(*row)
+        matrix.finish()
+        return matrix
+
+    def add(self, device_id, project, year, month, capacity, issued, issue_process):
+        column = self._columns[(int(year), month.lower())]
+        row = self._rows.get((device_id, project))
+        if row is None:
+            row = self._rows[(device_id, project)] = len(self.device_ids)
+            self.device_ids.append(device_id)
+            self.projects.append(project)
+            self.capacity.append(capacity)
+            self._issued.append([0] * len(self.month_keys))
+            self._issue_process.append([None] * len(self.month_keys))
+        elif capacity is not None and (self.capacity[row] is None or capacity < self.capacity[row]):
+            self.capacity[row] = capacity  # MIN(`Capacity (MW)`)
+
+        if issued is not None:
+            self._issued[row][column] += issued
+        # MAX(issue_process) of the month
+        current = self._issue_process[row][column]
+        if issue_process is not None and (current is None or issue_process > current):
+            self._issue_process[row][column] = issue_process
+
+    def finish(self):
+        """Freeze the accumulated rows into the issued, issue_process and partial matrices"""
+        self.issued = self._issued
+        self.issue_process = [[parse_issue_process(raw) for raw in row] for row in self._issue_process]
+        self.partial = [[len(values) > 1 for values in row] for row in self.issue_process]
+        self.total_issued = [sum(row) for row in self.issued]
+        self._issued = self._issue_process = None
+        return self
+
+    def __len__(self):
+        return len(self.device_ids)
+
+    def to_rows(self):
+        """Rows in the same shape as get_invoice_data's pivot mode"""
+        rows = []
+        for i, device_id in enumerate(self.device_ids):
+            row = {
+                "Device ID": device_id,
+                "Project": self.projects[i],
+                "Capacity": self.capacity[i],
+                "TotalIssued": self.total_issued[i],
+            }
+            for key, issued in zip(self.month_keys, self.issued[i]):
+                row[f"{key}Issued"] = issued
+            for key, issue_process, partial in zip(self.month_keys, self.issue_process[i], self.partial[i]):
+                row[f"{key}IssueProcess"] = issue_process
+                row[f"{key}IsPartial"] = partial
+            rows.append(row)
+        return rows
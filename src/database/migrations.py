@@ -0,0 +1,87 @@
+"""
+Index migrations for the invoice queries.
+
+Run once against the database (safe to re-run):
+
+    python -m src.database.migrations
+    python -m src.database.migrations --explain-pan ABCDE1234F --year 2024
+    python -m src.database.migrations --explain-pan ABCDE1234F --year 2023 --from April --to March --year-to 2024
+
+With --explain-pan the invoice query plan is printed before and after the
+indexes are created, so the switch from a full scan to an index range
+scan on inventory2 can be checked.
+"""
+import argparse
+import logging
+from sqlalchemy import inspect, text, bindparam
+from .db_connection import get_engine, get_session
+from .query import (get_devices_by_pan, get_period_months, _invoice_data_statement,
+                    _period_shape, _period_year_params)
+
+logger = logging.getLogger(__name__)
+
+# Index name -> (table, columns)
+INVOICE_INDEXES = {
+    # get_invoice_data / commit lookups: device list, year and month range
+    "idx_inventory2_device_year_month": ("inventory2", ("Device ID", "Year", "Month")),
+    # get_devices_by_pan and the per-group bulk invoice query
+    "idx_inventory2_pan_device": ("inventory2", ("PAN", "Device ID")),
+}
+
+def get_missing_indexes():
+    """Return the invoice indexes not yet present in the database"""
+    inspector = inspect(get_engine())
+    existing = {}
+    for table in {table for table, _ in INVOICE_INDEXES.values()}:
+        existing[table] = {index["name"] for index in inspector.get_indexes(table)}
+    return {
+        name: spec for name, spec in INVOICE_INDEXES.items()
+        if name not in existing[spec[0]]
+    }
+
+def create_invoice_indexes():
+    """Create any missing invoice indexes and return their names"""
+    missing = get_missing_indexes()
+    with get_session() as db:
+        for name, (table, columns) in missing.items():
+            column_sql = ", ".join(f"`{column}`" for column in columns)
+            logger.info(f"Creating index {name} on {table} ({column_sql})")
+            db.execute(text(f"CREATE INDEX `{name}` ON `{table}` ({column_sql})"))
+        db.commit()
+    return list(missing)
+
+def explain_invoice_query(device_ids, year, period_from="January", period_to="December", year_to=None):
+    """Return the query plan rows of the statement get_invoice_data runs for the devices and period"""
+    period_months = get_period_months(year, period_from, period_to, year_to)
+    statement = _invoice_data_statement(*_period_shape(period_months))
+    query = text(f"EXPLAIN {statement.text}").bindparams(bindparam("device_ids", expanding=True))
+    with get_session() as db:
+        result = db.execute(query, {"device_ids": list(device_ids), **_period_year_params(period_months)})
+        columns = list(result.keys())
+        return [dict(zip(columns, row)) for row in result]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create the indexes used by the invoice queries")
+    parser.add_argument("--explain-pan", help="Print the invoice query plan for this PAN's devices before and after")
+    parser.add_argument("--year", type=int, default=2024, help="Year used for the EXPLAIN check")
+    parser.add_argument("--from", dest="period_from", default="January", help="First month of the EXPLAIN period")
+    parser.add_argument("--to", dest="period_to", default="December", help="Last month of the EXPLAIN period")
+    parser.add_argument("--year-to", type=int, help="Year of the last month, for a period into the next year")
+    args = parser.parse_args(argv)
+
+    device_ids = get_devices_by_pan(args.explain_pan) if args.explain_pan else []
+    if device_ids:
+        print("Before:")
+        for row in explain_invoice_query(device_ids, args.year, args.period_from, args.period_to, args.year_to):
+            print(f"  {row}")
+
+    created = create_invoice_indexes()
+    print(f"Created indexes: {', '.join(created) if created else 'none (already present)'}")
+
+    if device_ids:
+        print("After:")
+        for row in explain_invoice_query(device_ids, args.year, args.period_from, args.period_to, args.year_to):
+            print(f"  {row}")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,37 @@
 # src/database/query.py
-from sqlalchemy import text
-from .db_connection import get_db
+import logging
+from functools import lru_cache
+from sqlalchemy import text, bindparam
+from .db_connection import get_session
+from .registration_cache import registration_cache
+from .device_cache import device_cache
+from .invoice_matrix import InvoiceMatrix
+from ..utils.issue_process import parse_issue_process
+from ..calculations.money import ZERO, to_decimal, quantize
+
+logger = logging.getLogger(__name__)
+
+# Devices per multi-row INSERT in register_devices
+REGISTER_CHUNK_SIZE = 500
+
+class InvoiceConflictError(Exception):
+    """Raised when device-months being invoiced were already invoiced by another commit"""
+    def __init__(self, device_months):
+        self.device_months = device_months  # (device ID, year, month) tuples
+        listed = ", ".join(f"{device_id} ({month.capitalize()} {year})" for device_id, year, month in device_months[:10])
+        more = f" and {len(device_months) - 10} more" if len(device_months) > 10 else ""
+        super().__init__(f"Already invoiced: {listed}{more}")
+
+class PartialInvoiceError(Exception):
+    """Raised when device-months would be invoiced for less than their full uninvoiced issuance"""
+    def __init__(self, device_months):
+        self.device_months = device_months  # (device ID, year, month) tuples
+        listed = ", ".join(f"{device_id} ({month.capitalize()} {year})" for device_id, year, month in device_months[:10])
+        more = f" and {len(device_months) - 10} more" if len(device_months) > 10 else ""
+        super().__init__(f"Partially billed: {listed}{more}")
 
 def get_all_sellers_data():
-    with next(get_db()) as db:
+    with get_session() as db:
         query = text("""
             SELECT `group`, seller, success_fee, indicative_price, gst, pan, address
             FROM sellers
@@ -29,9 +57,21 @@ def get_all_sellers_data():
 
         return sellers_data
 
-def get_devices_by_pan(pan):
+def get_sellers_checksum():
+    """Get a cheap checksum of the sellers table, or None if the database cannot provide one"""
+    with get_session() as db:
+        if db.get_bind().dialect.name != "mysql":
+            return None
+        row = db.execute(text("CHECKSUM TABLE sellers")).fetchone()
+        return row[1] if row else None
+
+def get_devices_by_pan(pan, use_cache=True):
     """Get distinct device IDs from inventory2 table for a given PAN number"""
-    with next(get_db()) as db:
+    if use_cache:
+        devices = device_cache.get(pan)
+        if devices is not None:
+            return devices
+    with get_session() as db:
         query = text("""
             SELECT DISTINCT `Device ID`
             FROM inventory2
@@ -39,143 +79,451 @@ def get_devices_by_pan(pan):
             ORDER BY `Device ID`
         """)
         result = db.execute(query, {"pan": pan})
-        return [row[0] for row in result]
+        devices = [row[0] for row in result]
+    device_cache.store(pan, devices)
+    return devices
+
+def prefetch_devices(pans):
+    """Load the device lists of all given PANs that are not cached with one query; returns how many were fetched"""
+    pans = device_cache.missing(dict.fromkeys(pan for pan in pans if pan))
+    if not pans:
+        return 0
+    with get_session() as db:
+        query = text("""
+            SELECT DISTINCT PAN, `Device ID`
+            FROM inventory2
+            WHERE PAN IN :pans
+            ORDER BY PAN, `Device ID`
+        """).bindparams(bindparam("pans", expanding=True))
+        result = db.execute(query, {"pans": pans})
+        devices_by_pan = {pan: [] for pan in pans}
+        for row in result:
+            devices_by_pan.setdefault(row[0], []).append(row[1])
+    for pan, devices in devices_by_pan.items():
+        device_cache.store(pan, devices)
+    return len(pans)
+
+def get_device_cache_stats():
+    """Get device list cache counters (lookups, hits, expired, evicted, size)"""
+    return device_cache.stats()
+
+MONTHS = ("january", "february", "march", "april", "may", "june",
+          "july", "august", "september", "october", "november", "december")
 
 def get_months_between(from_month, to_month):
     """Get list of months between two months inclusive"""
-    months = ["january", "february", "march", "april", "may", "june",
-             "july", "august", "september", "october", "november", "december"]
     # Convert input months to lowercase for comparison
     from_month = from_month.lower()
     to_month = to_month.lower()
-    start_idx = months.index(from_month)
-    end_idx = months.index(to_month)
-    return months[start_idx:end_idx + 1]
-
-def get_invoice_data(device_ids, year, period_from, period_to):
-    """Get invoice data for selected devices and period"""
-    months = get_months_between(period_from, period_to)
-
-    print("device_ids", device_ids)
-    print("year", year)
-    print("period_from", period_from)
-    print("period_to", period_to)
-    
-    # Generate dynamic SQL for each month's issued sum
+    start_idx = MONTHS.index(from_month)
+    end_idx = MONTHS.index(to_month)
+    return list(MONTHS[start_idx:end_idx + 1])
+
+def get_period_months(year, period_from, period_to, year_to=None):
+    """Get the (year, month) pairs from period_from of year to period_to of year_to inclusive
+
+    year_to defaults to year; a later year_to spans the turn of the year,
+    e.g. April 2023 to March 2024 for a financial year.
+    """
+    year = int(year)
+    year_to = year if year_to is None else int(year_to)
+    index = MONTHS.index(period_from.lower())
+    end = (year_to, MONTHS.index(period_to.lower()))
+    if end < (year, index):
+        raise ValueError(f"Invoice period ends ({period_to} {year_to}) before it starts ({period_from} {year})")
+
+    period_months = []
+    while (year, index) <= end:
+        period_months.append((year, MONTHS[index]))
+        year, index = (year + 1, 0) if index == 11 else (year, index + 1)
+    return period_months
+
+def get_month_key(year, month):
+    """Key of a period month in the pivoted rows, e.g. (2024, 'April') -> 'april2024'"""
+    return f"{month.lower()}{year}"
+
+def get_period_month_keys(period_months):
+    return [get_month_key(year, month) for year, month in period_months]
+
+def get_month_variants(months):
+    """Get the spellings a month name can be stored under in inventory2
+
+    Comparing Month against literals instead of LOWER(Month) keeps the
+    predicate sargable, so the (Device ID, Year, Month) index is usable.
+    """
+    variants = []
+    for month in months:
+        variants.extend((month.capitalize(), month, month.upper()))
+    return tuple(variants)
+
+def _period_shape(period_months):
+    """Month-range shape of a period: (index of its first month, number of months)
+
+    Periods of the same shape share one statement; their years are bound
+    as :year_0, :year_1, ... in order of appearance.
+    """
+    return MONTHS.index(period_months[0][1]), len(period_months)
+
+def _period_year_params(period_months):
+    years = dict.fromkeys(year for year, _ in period_months)
+    return {f"year_{i}": year for i, year in enumerate(years)}
+
+def _shape_months(start_index, month_count):
+    """(year offset, month) pairs of a month-range shape"""
+    return [
+        (offset, MONTHS[index])
+        for offset, index in (divmod(start_index + i, 12) for i in range(month_count))
+    ]
+
+def _month_literals(months):
+    return ", ".join(f"'{variant}'" for variant in get_month_variants(months))
+
+def _build_period_filter_sql(start_index, month_count):
+    """Build the (Year, Month) predicate of a month-range shape, one branch per year"""
+    months_by_offset = {}
+    for offset, month in _shape_months(start_index, month_count):
+        months_by_offset.setdefault(offset, []).append(month)
+
+    clauses = [
+        f"(Year = :year_{offset} AND Month IN ({_month_literals(months)}))"
+        for offset, months in months_by_offset.items()
+    ]
+    return "(" + " OR ".join(clauses) + ")"
+
+def _build_month_columns_sql(start_index, month_count):
+    """Build the per-month issued sums and issue_process pivot columns, aliased by position"""
     month_sums = []
     month_issue_process = []
-    for month in months:
-        month_sums.append(f"SUM(CASE WHEN LOWER(Month) = '{month}' THEN Issued ELSE 0 END) AS `{month}Issued`")
-        month_issue_process.append(f"MAX(CASE WHEN LOWER(Month) = '{month}' THEN issue_process ELSE NULL END) AS `{month}IssueProcess`")
-    month_sums_sql = ", ".join(month_sums)
-    month_issue_process_sql = ", ".join(month_issue_process)
-    
-    # Convert months to tuple for IN clause
-    months_tuple = tuple(months)
-    
-    with next(get_db()) as db:
-        query = text(f"""
-            SELECT 
-                `Device ID`,
-                `Project`,
-                MIN(`Capacity (MW)`) AS Capacity,
-                SUM(Issued) AS TotalIssued,
-                {month_sums_sql},
-                {month_issue_process_sql}
-            FROM inventory2
-            WHERE 
-                `Device ID` IN :device_ids AND 
-                Year = :year AND 
-                LOWER(Month) IN :months AND
-                Issued > 0 AND
-                invoice_status = 'False'
-            GROUP BY `Device ID`, `Project`
-        """)
-        
-        # Prepare parameters
-        params = {
-            "device_ids": tuple(device_ids),
-            "year": year,
-            "months": months_tuple
-        }
-            
+    for i, (offset, month) in enumerate(_shape_months(start_index, month_count)):
+        condition = f"Year = :year_{offset} AND Month IN ({_month_literals([month])})"
+        month_sums.append(f"SUM(CASE WHEN {condition} THEN Issued ELSE 0 END) AS m{i}Issued")
+        month_issue_process.append(f"MAX(CASE WHEN {condition} THEN issue_process ELSE NULL END) AS m{i}IssueProcess")
+    return ", ".join(month_sums) + ",\n" + ", ".join(month_issue_process)
+
+@lru_cache(maxsize=None)
+def _invoice_data_statement(start_index, month_count, by_pan=False):
+    """Pivot statement of a month-range shape, built once and reused
+
+    The text is identical for every period of the shape and the device IDs
+    (or PANs) are an expanding parameter, so SQLAlchemy's compiled cache
+    keeps hitting whatever the years and the device list are.
+    """
+    key_column = "PAN" if by_pan else "`Device ID`"
+    key_param = "pans" if by_pan else "device_ids"
+    select_pan = "PAN," if by_pan else ""
+    group_pan = "PAN, " if by_pan else ""
+    return text(f"""
+        SELECT 
+            {select_pan}
+            `Device ID`,
+            `Project`,
+            MIN(`Capacity (MW)`) AS Capacity,
+            SUM(Issued) AS TotalIssued,
+            {_build_month_columns_sql(start_index, month_count)}
+        FROM inventory2
+        WHERE 
+            {key_column} IN :{key_param} AND 
+            {_build_period_filter_sql(start_index, month_count)} AND
+            Issued > 0 AND
+            invoice_status = 'False'
+        GROUP BY {group_pan}`Device ID`, `Project`
+    """).bindparams(bindparam(key_param, expanding=True))
+
+@lru_cache(maxsize=None)
+def _invoice_rows_statement(start_index, month_count):
+    """Long-format statement of a month-range shape: one narrow row per inventory2 row, no pivot"""
+    return text(f"""
+        SELECT `Device ID`, `Project`, Year, Month, `Capacity (MW)`, Issued, issue_process
+        FROM inventory2
+        WHERE 
+            `Device ID` IN :device_ids AND 
+            {_build_period_filter_sql(start_index, month_count)} AND
+            Issued > 0 AND
+            invoice_status = 'False'
+    """).bindparams(bindparam("device_ids", expanding=True))
+
+def get_statement_cache_stats():
+    """Get pivot statement cache counters (hits, misses, currsize)"""
+    return _invoice_data_statement.cache_info()._asdict()
+
+def _invoice_data_columns(month_keys):
+    """Row keys of a pivot statement's columns after Device ID, in select order"""
+    return (["Device ID", "Project", "Capacity", "TotalIssued"]
+            + [f"{key}Issued" for key in month_keys]
+            + [f"{key}IssueProcess" for key in month_keys])
+
+def _add_partial_flags(data, month_keys):
+    """Parse each month's issue_process in place and add its {key}IsPartial flag"""
+    for key in month_keys:
+        issue_process_key = f"{key}IssueProcess"
+        issue_process = parse_issue_process(data.get(issue_process_key))
+        data[issue_process_key] = issue_process
+        data[f"{key}IsPartial"] = len(issue_process) > 1
+    return data
+
+def get_invoice_matrix(device_ids, year, period_from, period_to, year_to=None):
+    """Get invoice data for selected devices and period as an InvoiceMatrix
+
+    The rows are fetched in long format and pivoted into the device x month
+    matrix in Python, so the database does no CASE pivot at all.
+    """
+    period_months = get_period_months(year, period_from, period_to, year_to)
+    query = _invoice_rows_statement(*_period_shape(period_months))
+    params = {"device_ids": list(device_ids), **_period_year_params(period_months)}
+
+    with get_session() as db:
         result = db.execute(query, params)
-        
-        # Convert result to list of dictionaries and process partial issues
-        columns = result.keys()
-        invoice_data = []
-        
+        return InvoiceMatrix.from_rows(result, period_months, get_period_month_keys(period_months))
+
+def get_invoice_data(device_ids, year, period_from, period_to, year_to=None, mode="pivot"):
+    """Get invoice data for selected devices and period
+
+    The period runs from period_from of year to period_to of year_to
+    (default: the same year). Month columns are keyed by year-month, e.g.
+    april2023Issued, april2023IssueProcess and april2023IsPartial.
+    mode "pivot" lets the database pivot the months; "long" fetches narrow
+    rows and pivots them client-side (see get_invoice_matrix). Both return
+    the same rows.
+    """
+    if mode == "long":
+        return get_invoice_matrix(device_ids, year, period_from, period_to, year_to).to_rows()
+    if mode != "pivot":
+        raise ValueError(f"Unknown invoice fetch mode: {mode}")
+
+    period_months = get_period_months(year, period_from, period_to, year_to)
+    month_keys = get_period_month_keys(period_months)
+    query = _invoice_data_statement(*_period_shape(period_months))
+    params = {"device_ids": list(device_ids), **_period_year_params(period_months)}
+
+    with get_session() as db:
+        result = db.execute(query, params)
+        columns = _invoice_data_columns(month_keys)
+        return [_add_partial_flags(dict(zip(columns, row)), month_keys) for row in result]
+
+def _normalize_pan(pan):
+    """PAN as compared by MySQL's default collation: case and trailing spaces do not matter"""
+    return pan.strip().upper() if pan else pan
+
+def get_bulk_invoice_data(seller_devices, year, period_from, period_to, year_to=None):
+    """Get invoice data for many sellers with a single query
+
+    seller_devices maps each PAN to its selected device IDs, or to None to
+    take every device of that PAN. Returns a dict of PAN to a list of rows
+    in the same shape as get_invoice_data.
+    """
+    if not seller_devices:
+        return {}
+
+    period_months = get_period_months(year, period_from, period_to, year_to)
+    month_keys = get_period_month_keys(period_months)
+    query = _invoice_data_statement(*_period_shape(period_months), by_pan=True)
+    params = {"pans": list(seller_devices), **_period_year_params(period_months)}
+
+    with get_session() as db:
+        result = db.execute(query, params)
+        columns = _invoice_data_columns(month_keys)
+
+        # Device filters as sets keyed by normalized PAN; None keeps every device of the PAN
+        selected = {}
+        seller_pans = {}
+        for pan, device_ids in seller_devices.items():
+            seller_pans.setdefault(_normalize_pan(pan), pan)
+            selected.setdefault(_normalize_pan(pan), set(device_ids) if device_ids is not None else None)
+        invoice_data = {pan: [] for pan in seller_devices}
+
         for row in result:
-            data = dict(zip(columns, row))
-            
-            # Add is_partial flag for each month
-            for month in months:
-                issue_process_key = f"{month}IssueProcess"
-                if data.get(issue_process_key):
-                    try:
-                        issue_process = eval(data[issue_process_key])  # Convert JSON string to Python object
-                        data[f"{month}IsPartial"] = len(issue_process) > 1 if isinstance(issue_process, list) else False
-                    except:
-                        data[f"{month}IsPartial"] = False
-                else:
-                    data[f"{month}IsPartial"] = False
-            
-            invoice_data.append(data)
-            
+            # The PAN comes back as stored in inventory2, which may differ in case or spacing
+            pan = _normalize_pan(row[0])
+            if pan not in selected:
+                logger.warning(f"Skipping inventory row of unrequested PAN {row[0]!r}")
+                continue
+            devices = selected[pan]
+            if devices is not None and row[1] not in devices:
+                continue
+            invoice_data[seller_pans[pan]].append(_add_partial_flags(dict(zip(columns, row[1:])), month_keys))
+
         return invoice_data
 
+def get_group_invoice_data(sellers, year, period_from, period_to, year_to=None):
+    """Get invoice data for every device of every seller in a group, keyed by PAN"""
+    seller_devices = {seller["pan"]: None for seller in sellers if seller["pan"]}
+    return get_bulk_invoice_data(seller_devices, year, period_from, period_to, year_to)
+
 def get_registered_devices(device_ids):
-    """Get list of registered device IDs from invoicereg table"""
-    with next(get_db()) as db:
-        # Convert comma-separated string to list if needed
-        if isinstance(device_ids, str):
-            device_ids = device_ids.split(',')
-            
+    """Get the set of registered device IDs from invoicereg table
+
+    Answers come from the registration cache where possible; only device
+    IDs it cannot answer for are looked up in the database.
+    """
+    device_ids = _normalize_device_ids(device_ids)
+    registered, unknown = registration_cache.split(device_ids)
+    if not unknown:
+        return registered
+
+    with get_session() as db:
         query = text("""
             SELECT `Device ID`
             FROM invoicereg
             WHERE `Device ID` IN :device_ids
-        """)
+        """).bindparams(bindparam("device_ids", expanding=True))
         
-        result = db.execute(query, {"device_ids": tuple(device_ids)})
-        return ','.join(row[0] for row in result)
+        result = db.execute(query, {"device_ids": list(unknown)})
+        found = {row[0] for row in result}
+
+    registration_cache.store(unknown, found)
+    return registered | found
+
+def get_registration_stats():
+    """Get registration lookup counters (lookups, cache hits, database queries)"""
+    return registration_cache.stats()
+
+def _insert_invoice_data(db, invoice_data):
+    """Insert invoice data into the invoicedata table on an open session"""
+    query = text("""
+        INSERT INTO invoicedata (
+            invoiceid, groupName, capacity, regNo, regdevice, issued, ISP,
+            registrationFee, issuanceFee, USDExchange, EURExchange,
+            invoicePeriodFrom, invoicePeriodTo, gross, regFeeINR, issuanceINR,
+            netRevenue, successFee, finalRevenue, project, netRate, pan, gst,
+            address, date, deviceIds, companyName
+        ) VALUES (
+            :invoiceid, :groupName, :capacity, :regNo, :regdevice, :issued, :ISP,
+            :registrationFee, :issuanceFee, :USDExchange, :EURExchange,
+            :invoicePeriodFrom, :invoicePeriodTo, :gross, :regFeeINR, :issuanceINR,
+            :netRevenue, :successFee, :finalRevenue, :project, :netRate, :pan, :gst,
+            :address, :date, :deviceIds, :companyName
+        )
+    """)
+    db.execute(query, invoice_data)
 
 def insert_invoice_data(invoice_data):
     """Insert invoice data into the invoicedata table"""
-    with next(get_db()) as db:
-        query = text("""
-            INSERT INTO invoicedata (
-                invoiceid, groupName, capacity, regNo, regdevice, issued, ISP,
-                registrationFee, issuanceFee, USDExchange, EURExchange,
-                invoicePeriodFrom, invoicePeriodTo, gross, regFeeINR, issuanceINR,
-                netRevenue, successFee, finalRevenue, project, netRate, pan, gst,
-                address, date, deviceIds, companyName
-            ) VALUES (
-                :invoiceid, :groupName, :capacity, :regNo, :regdevice, :issued, :ISP,
-                :registrationFee, :issuanceFee, :USDExchange, :EURExchange,
-                :invoicePeriodFrom, :invoicePeriodTo, :gross, :regFeeINR, :issuanceINR,
-                :netRevenue, :successFee, :finalRevenue, :project, :netRate, :pan, :gst,
-                :address, :date, :deviceIds, :companyName
-            )
+    with get_session() as db:
+        _insert_invoice_data(db, invoice_data)
+        db.commit()
+
+def _normalize_device_ids(device_ids):
+    """Turn a comma-separated string or iterable of device IDs into a de-duplicated list"""
+    if isinstance(device_ids, str):
+        device_ids = device_ids.split(',')
+    return list(dict.fromkeys(d.strip() for d in device_ids if d and d.strip()))
+
+def _register_devices(db, device_ids, chunk_size):
+    """Insert device IDs into invoicereg on an open session, one multi-row statement per chunk
+
+    Returns the number of devices that were not registered before.
+    """
+    newly_registered = 0
+    # SQLite spells MySQL's INSERT IGNORE as INSERT OR IGNORE
+    insert_ignore = "INSERT OR IGNORE" if db.get_bind().dialect.name == "sqlite" else "INSERT IGNORE"
+    for start in range(0, len(device_ids), chunk_size):
+        chunk = device_ids[start:start + chunk_size]
+        values_sql = ", ".join(f"(:device_id_{i})" for i in range(len(chunk)))
+        # INSERT IGNORE skips already registered devices, so rowcount is the new ones only
+        query = text(f"""
+            {insert_ignore} INTO invoicereg (`Device ID`)
+            VALUES {values_sql}
         """)
-        
-        db.execute(query, invoice_data)
+        result = db.execute(query, {f"device_id_{i}": device_id for i, device_id in enumerate(chunk)})
+        newly_registered += result.rowcount
+    return newly_registered
+
+def register_devices(device_ids, chunk_size=REGISTER_CHUNK_SIZE):
+    """Register devices in the invoicereg table and return how many were newly registered"""
+    device_ids = _normalize_device_ids(device_ids)
+    if not device_ids:
+        return 0
+
+    with get_session() as db:
+        newly_registered = _register_devices(db, device_ids, chunk_size)
         db.commit()
 
-def register_devices(device_ids):
-    """Register devices in the invoicereg table"""
-    with next(get_db()) as db:
-        # Convert to list if string
-        if isinstance(device_ids, str):
-            device_ids = device_ids.split(',')
-        
-        # Insert each device ID
-        for device_id in device_ids:
-            query = text("""
-                INSERT INTO invoicereg (`Device ID`)
-                VALUES (:device_id)
-                ON DUPLICATE KEY UPDATE `Device ID` = VALUES(`Device ID`)
-            """)
-            db.execute(query, {"device_id": device_id.strip()})
-        
-        db.commit()
\ No newline at end of file
+    registration_cache.mark_registered(device_ids)
+    return newly_registered
+
+@lru_cache(maxsize=None)
+def _commit_lock_statement(start_index, month_count):
+    """Row-lock statement of a month-range shape: the uninvoiced rows of the period"""
+    return text(f"""
+        SELECT `Device ID`, Year, Month, Issued
+        FROM inventory2
+        WHERE 
+            `Device ID` IN :device_ids AND 
+            {_build_period_filter_sql(start_index, month_count)} AND
+            Issued > 0 AND
+            invoice_status = 'False'
+        FOR UPDATE
+    """).bindparams(bindparam("device_ids", expanding=True))
+
+# Marks one month of the given devices as invoiced
+MARK_INVOICED_QUERY = text("""
+    UPDATE inventory2
+    SET invoice_status = 'True'
+    WHERE 
+        `Device ID` IN :device_ids AND 
+        Year = :year AND
+        Month IN :months AND
+        Issued > 0 AND
+        invoice_status = 'False'
+""").bindparams(bindparam("device_ids", expanding=True), bindparam("months", expanding=True))
+
+def commit_invoice(invoice_record, invoice_rows, year, period_from, period_to,
+                   chunk_size=REGISTER_CHUNK_SIZE, year_to=None):
+    """Save an invoice atomically: invoicedata row, device registration and invoice_status
+
+    The uninvoiced inventory2 rows are locked first, so a concurrent commit
+    for the same device-months blocks until this one finishes and then
+    fails with InvoiceConflictError instead of billing them twice.
+    Only the device-months with an issued amount in invoice_rows are
+    marked invoiced; months left at 0 stay available for a later invoice.
+    invoice_status is per row, so a month can only be marked invoiced
+    whole: a month billed for less than its full uninvoiced Issued (a
+    subset of its partial issuances) fails with PartialInvoiceError and
+    nothing is saved, rather than marking the unbilled issuances invoiced.
+    Returns the number of newly registered devices.
+    """
+    period_months = get_period_months(year, period_from, period_to, year_to)
+    lock_query = _commit_lock_statement(*_period_shape(period_months))
+    device_ids = _normalize_device_ids(row['Device ID'] for row in invoice_rows)
+    params = {"device_ids": device_ids, **_period_year_params(period_months)}
+
+    # Device-months this invoice bills for, with the billed amount
+    billed = {}
+    for row in invoice_rows:
+        for month_year, month in period_months:
+            issued = row.get(f"{get_month_key(month_year, month)}Issued")
+            if issued:
+                billed[(row['Device ID'], month_year, month)] = quantize(issued)
+
+    with get_session() as db:
+        # Uninvoiced Issued of each locked device-month
+        available = {}
+        for device_id, month_year, month, issued in db.execute(lock_query, params):
+            key = (device_id, int(month_year), month.lower())
+            available[key] = available.get(key, ZERO) + to_decimal(issued)
+
+        already_invoiced = sorted(billed.keys() - available.keys())
+        if already_invoiced:
+            raise InvoiceConflictError(already_invoiced)
+
+        partially_billed = sorted(key for key, issued in billed.items() if issued != quantize(available[key]))
+        if partially_billed:
+            raise PartialInvoiceError(partially_billed)
+
+        # Billed devices per month, so each month is one UPDATE
+        billed_devices = {}
+        for device_id, month_year, month in billed:
+            billed_devices.setdefault((month_year, month), []).append(device_id)
+
+        _insert_invoice_data(db, invoice_record)
+        newly_registered = _register_devices(db, device_ids, chunk_size)
+        for (month_year, month), month_device_ids in sorted(billed_devices.items()):
+            db.execute(MARK_INVOICED_QUERY, {
+                "device_ids": month_device_ids,
+                "year": month_year,
+                "months": get_month_variants([month])
+            })
+        db.commit()
+
+    registration_cache.mark_registered(device_ids)
+    return newly_registered
@@ -0,0 +1,65 @@
+import threading
+import time
+
+# How long an "unregistered" answer is trusted before asking the database again.
+# Registered devices never become unregistered, so positive entries do not expire.
+UNREGISTERED_TTL = 600
+
+class RegistrationCache:
+    """Thread-safe registration status of devices, keyed by device ID"""
+
+    def __init__(self, unregistered_ttl=UNREGISTERED_TTL):
+        self.unregistered_ttl = unregistered_ttl
+        self._lock = threading.Lock()
+        self._registered = set()
+        self._unregistered = {}  # device ID -> time it was seen unregistered
+        self._stats = {"lookups": 0, "hits": 0, "queries": 0}
+
+    def split(self, device_ids):
+        """Return (registered, unknown) for the given IDs, counting a lookup"""
+        now = time.monotonic()
+        registered = set()
+        unknown = []
+        with self._lock:
+            self._stats["lookups"] += 1
+            for device_id in device_ids:
+                if device_id in self._registered:
+                    registered.add(device_id)
+                    continue
+                seen = self._unregistered.get(device_id)
+                if seen is None or now - seen > self.unregistered_ttl:
+                    unknown.append(device_id)
+            if not unknown:
+                self._stats["hits"] += 1
+        return registered, unknown
+
+    def store(self, queried_ids, registered_ids):
+        """Record the result of a database lookup over queried_ids"""
+        now = time.monotonic()
+        with self._lock:
+            self._stats["queries"] += 1
+            for device_id in queried_ids:
+                if device_id in registered_ids:
+                    self._registered.add(device_id)
+                    self._unregistered.pop(device_id, None)
+                else:
+                    self._unregistered[device_id] = now
+
+    def mark_registered(self, device_ids):
+        """Invalidate cached "unregistered" answers after devices were registered"""
+        with self._lock:
+            for device_id in device_ids:
+                self._registered.add(device_id)
+                self._unregistered.pop(device_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._registered.clear()
+            self._unregistered.clear()
+
+    def stats(self):
+        """Return lookup counters; "queries" is the number of database round trips"""
+        with self._lock:
+            return dict(self._stats)
+
+registration_cache = RegistrationCache()
@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import threading
+import logging
+from .db_connection import load_settings
+from .query import get_all_sellers_data, get_sellers_checksum
+
+logger = logging.getLogger(__name__)
+
+class SellersCache:
+    """Thread-safe sellers master data, indexed by group, by (group, seller) and by PAN
+
+    refresh() revalidates with get_sellers_checksum() and only re-reads the
+    sellers table when the checksum changed (or the database has none).
+    The optional JSON snapshot (SELLERS_SNAPSHOT_PATH) lets the dropdowns be
+    filled before the database answers.
+    """
+
+    def __init__(self, snapshot_path=None):
+        self._snapshot_path = snapshot_path
+        self._lock = threading.Lock()
+        self._groups = {}
+        self._by_name = {}
+        self._by_pan = {}
+        self.checksum = None
+        self.loaded_at = None
+
+    def load(self, sellers_data, checksum=None):
+        """Replace the cached data with {group: [seller_info, ...]}"""
+        by_name = {}
+        by_pan = {}
+        for group_name, sellers in sellers_data.items():
+            for seller_info in sellers:
+                by_name[(group_name, seller_info["seller"])] = seller_info
+                if seller_info["pan"]:
+                    by_pan.setdefault(seller_info["pan"], seller_info)
+        with self._lock:
+            self._groups = sellers_data
+            self._by_name = by_name
+            self._by_pan = by_pan
+            self.checksum = checksum
+            self.loaded_at = time.monotonic()
+
+    def refresh(self, force=False):
+        """Reload the sellers table if it changed; returns True when the cached data was replaced"""
+        checksum = get_sellers_checksum()
+        if not force and self.loaded_at is not None and checksum is not None and checksum == self.checksum:
+            logger.info("Sellers data unchanged")
+            return False
+        sellers_data = get_all_sellers_data()
+        if not force and sellers_data == self.as_dict():
+            self.load(sellers_data, checksum)
+            return False
+        self.load(sellers_data, checksum)
+        self.save_snapshot()
+        return True
+
+    @property
+    def snapshot_path(self):
+        if self._snapshot_path is None:
+            load_settings()
+            return os.getenv('SELLERS_SNAPSHOT_PATH')
+        return self._snapshot_path
+
+    def load_snapshot(self):
+        """Load the on-disk snapshot if there is one; returns True when it was loaded"""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            self.load(snapshot["sellers"], snapshot.get("checksum"))
+            return True
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable sellers snapshot {self.snapshot_path}: {str(e)}")
+            return False
+
+    def save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            snapshot = {"checksum": self.checksum, "sellers": self._groups}
+        try:
+            temp_path = f"{self.snapshot_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, default=str)  # Decimal fees are stored as text
+            os.replace(temp_path, self.snapshot_path)
+        except OSError as e:
+            logger.warning(f"Could not write sellers snapshot {self.snapshot_path}: {str(e)}")
+
+    def is_loaded(self):
+        return self.loaded_at is not None
+
+    def as_dict(self):
+        """Return {group: [seller_info, ...]} as returned by get_all_sellers_data"""
+        with self._lock:
+            return self._groups
+
+    def groups(self):
+        with self._lock:
+            return list(self._groups)
+
+    def sellers(self, group_name):
+        with self._lock:
+            return self._groups.get(group_name, [])
+
+    def get(self, group_name, company_name):
+        """Return the seller_info of a company in a group, or None"""
+        with self._lock:
+            return self._by_name.get((group_name, company_name))
+
+    def get_by_pan(self, pan):
+        with self._lock:
+            return self._by_pan.get(pan)
+
+sellers_cache = SellersCache()
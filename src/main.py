@@ -1,3 +1,6 @@
+import time
+STARTED = time.perf_counter()
+
 import sys
 import os
 
@@ -6,13 +9,38 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
 from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
 from src.ui.main_window import MainWindow
 
+HEAVY_MODULES = ('sqlalchemy', 'reportlab', 'openpyxl', 'nanoid', 'numpy')
+
+def report_startup(stage):
+    """Print the time since process start and which heavy modules are loaded"""
+    elapsed = (time.perf_counter() - STARTED) * 1000
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(f"{stage}: {elapsed:.0f} ms (loaded: {', '.join(loaded) or 'none'})")
+
+def wait_for_background_loading(window, app):
+    """Report when the sellers (and device prefetch) finished loading, then quit"""
+    def on_busy_changed(busy):
+        if not busy:
+            report_startup("Sellers loaded")
+            QTimer.singleShot(0, app.quit)
+    window.invoice_form.tasks.busy_changed.connect(on_busy_changed)
+    if not window.invoice_form.tasks.is_busy():
+        on_busy_changed(False)
+
 def main():
+    # --benchmark-startup prints time-to-first-paint, form and sellers readiness, then exits
+    benchmark = '--benchmark-startup' in sys.argv
     app = QApplication(sys.argv)
     
-    # Create and show the main window
-    window = MainWindow()
+    # Create and show the main window; the invoice form is built after the first paint
+    window = MainWindow(defer_form=True)
+    if benchmark:
+        window.first_paint.connect(lambda: report_startup("First paint"))
+        window.form_ready.connect(lambda: report_startup("Form ready"))
+        window.form_ready.connect(lambda: wait_for_background_loading(window, app))
     window.show()
     
     # Start the event loop
@@ -0,0 +1,109 @@
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSortFilterProxyModel, pyqtSignal
+
+class DeviceListModel(QAbstractListModel):
+    """Checkable list of device IDs for the device picker
+
+    Check state is stored as a default (all checked or not) plus the set of
+    IDs toggled away from it, so select all / clear all are O(1) no matter
+    how many devices a seller has.
+    """
+    selection_changed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._devices = []
+        self._all_checked = False
+        self._toggled = set()
+
+    def set_devices(self, devices):
+        """Replace the device list; every device starts unchecked"""
+        self.beginResetModel()
+        self._devices = list(devices)
+        self._all_checked = False
+        self._toggled = set()
+        self.endResetModel()
+        self.selection_changed.emit()
+
+    def devices(self):
+        return self._devices
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._devices)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        device_id = self._devices[index.row()]
+        if role == Qt.DisplayRole:
+            return device_id
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if self.is_checked(device_id) else Qt.Unchecked
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.CheckStateRole:
+            return False
+        device_id = self._devices[index.row()]
+        self._set_checked(device_id, value == Qt.Checked)
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        self.selection_changed.emit()
+        return True
+
+    def is_checked(self, device_id):
+        return (device_id in self._toggled) != self._all_checked
+
+    def _set_checked(self, device_id, checked):
+        if checked == self._all_checked:
+            self._toggled.discard(device_id)
+        else:
+            self._toggled.add(device_id)
+
+    def set_all_checked(self, checked):
+        """Check or uncheck every device in O(1)"""
+        self._all_checked = checked
+        self._toggled = set()
+        if self._devices:
+            self.dataChanged.emit(self.index(0), self.index(len(self._devices) - 1), [Qt.CheckStateRole])
+        self.selection_changed.emit()
+
+    def set_checked(self, rows, checked):
+        """Check or uncheck the devices at the given source rows"""
+        rows = list(rows)
+        for row in rows:
+            self._set_checked(self._devices[row], checked)
+        if rows:
+            self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)), [Qt.CheckStateRole])
+        self.selection_changed.emit()
+
+    def selected_ids(self):
+        """Set of checked device IDs"""
+        if self._all_checked:
+            return set(self._devices) - self._toggled
+        return set(self._toggled)
+
+    def selected_count(self):
+        if self._all_checked:
+            return len(self._devices) - len(self._toggled)
+        return len(self._toggled)
+
+    def selected_devices(self):
+        """Checked device IDs in display order"""
+        return [device_id for device_id in self._devices if self.is_checked(device_id)]
+
+class DeviceFilterProxyModel(QSortFilterProxyModel):
+    """Case-insensitive substring search over a DeviceListModel"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFilterCaseSensitivity(Qt.CaseInsensitive)
+
+    def set_search_text(self, text):
+        self.setFilterFixedString(text.strip())
+
+    def visible_source_rows(self):
+        return [self.mapToSource(self.index(row, 0)).row() for row in range(self.rowCount())]
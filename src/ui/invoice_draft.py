@@ -0,0 +1,41 @@
+from ..calculations.invoice_calculator import InvoiceCalculator
+
+class InvoiceDraft:
+    """Fetched inventory and registration status of the last generate
+
+    Device totals are computed once, so changing prices, rates or fees only
+    reruns the money calculation. The database is needed again only when
+    the device set or the period changes. The group, company and period the
+    draft was fetched for are kept, so an invoice is saved for those and
+    not for whatever the form shows by then.
+    """
+
+    def __init__(self, device_ids, year, period_from, period_to, invoice_data, registered_devices,
+                 year_to=None, group_name=None, company_name=None):
+        self.key = self._key(device_ids, year, period_from, period_to, year_to)
+        self.group_name = group_name
+        self.company_name = company_name
+        self.year = year
+        self.period_from = period_from
+        self.period_to = period_to
+        self.year_to = year if year_to is None else year_to
+        self.invoiced = False  # Set once saved; the inventory must then be fetched again
+        self.invoice_data = invoice_data
+        self.registered_devices = registered_devices
+        self.totals = InvoiceCalculator.calculate_totals(invoice_data, registered_devices)
+
+    @staticmethod
+    def _key(device_ids, year, period_from, period_to, year_to):
+        return (frozenset(device_ids), year, period_from, period_to, year if year_to is None else year_to)
+
+    def matches(self, device_ids, year, period_from, period_to, year_to=None):
+        """Whether this draft was fetched for the given devices and period"""
+        return not self.invoiced and self.key == self._key(device_ids, year, period_from, period_to, year_to)
+
+    def calculate(self, unit_sale_price, success_fee_percent, usd_rate, eur_rate, remove_fees=False):
+        """Calculate the invoice amounts for the given prices, rates and fee setting"""
+        total_capacity, total_devices, total_issued, registration_fee = self.totals
+        return InvoiceCalculator.calculate_amounts_from_totals(
+            total_capacity, total_devices, total_issued, 0 if remove_fees else registration_fee,
+            unit_sale_price, 0 if remove_fees else success_fee_percent, usd_rate, eur_rate, remove_fees
+        )
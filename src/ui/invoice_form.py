@@ -1,36 +1,91 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QFormLayout,
                              QLabel, QLineEdit, QComboBox, QSpinBox, QDoubleSpinBox,
-                             QPushButton, QFrame, QCheckBox, QScrollArea, QGroupBox,
-                             QMessageBox, QTextBrowser, QSizePolicy, QDialog, QTableWidget,
-                             QTableWidgetItem, QHeaderView)
-from PyQt5.QtCore import Qt
+                             QPushButton, QFrame, QCheckBox, QGroupBox,
+                             QMessageBox, QTableView, QSizePolicy, QDialog, QTableWidget,
+                             QTableWidgetItem, QHeaderView, QProgressBar, QListView)
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QIcon
-from ..database.query import (get_all_sellers_data, get_devices_by_pan, 
+from ..database.query import (get_devices_by_pan, prefetch_devices, 
                            get_invoice_data, get_registered_devices,
-                           insert_invoice_data, register_devices,
-                           get_months_between)
-from ..calculations.invoice_calculator import InvoiceCalculator
+                           get_registration_stats, commit_invoice, InvoiceConflictError,
+                           PartialInvoiceError,
+                           get_period_months, get_month_key)
+from ..database.sellers_cache import sellers_cache
+from ..database.device_cache import device_cache
+from ..calculations.money import ZERO, CAPACITY_PLACES, to_decimal, format_amount
 from ..utils.excel_handler import ExcelInvoiceGenerator
+from ..utils.worksheet_pdf import generate_worksheet_pdf
+from ..utils.invoice_payload import (build_invoice_record, build_excel_data,
+                                     get_project_text, get_output_dir)
+from .workers import TaskRunner
+from .device_model import DeviceListModel, DeviceFilterProxyModel
+from .preview_model import InvoicePreviewModel
+from .invoice_draft import InvoiceDraft
 import logging
 from decimal import Decimal
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
 import os
 from datetime import datetime
-from nanoid import generate
 import sys
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Pause after the last price, rate or fee change before the draft is recalculated
+RECALC_DEBOUNCE_MS = 150
+
+# Preview summary sections: (title, [(label, calculations key, decimal places, suffix), ...])
+PREVIEW_SUMMARY = (
+    ("Device Information", (
+        ("Total Devices", 'total_devices', None, ""),
+        ("Total Capacity", 'capacity', CAPACITY_PLACES, " MW"),
+        ("Total Issued", 'total_issued', 4, ""),
+    )),
+    ("Fees", (
+        ("Registration Fee (EUR)", 'registration_fee', 2, ""),
+        ("Registration Fee (INR)", 'reg_fee_inr', 4, ""),
+        ("Issuance Fee (EUR)", 'issuance_fee', 4, ""),
+        ("Issuance Fee (INR)", 'issuance_fee_inr', 4, ""),
+    )),
+    ("Revenue Calculation", (
+        ("Gross Amount (INR)", 'gross_amount', 4, ""),
+        ("Net Revenue (INR)", 'net_revenue', 4, ""),
+        ("Success Fee (INR)", 'success_fee', 4, ""),
+        ("Final Revenue (INR)", 'final_revenue', 4, ""),
+    )),
+    ("Final Rate", (
+        ("Net Rate", 'net_rate', 4, ""),
+    )),
+)
+
+def fetch_invoice_data(device_ids, year, period_from, period_to, year_to):
+    """Background task: fetch invoice data and the registration status of its devices"""
+    invoice_data = get_invoice_data(device_ids, year, period_from, period_to, year_to)
+    registered_devices = get_registered_devices(d['Device ID'] for d in invoice_data)
+    return invoice_data, registered_devices
+
+def save_invoice(invoice_record, invoice_rows, year, period_from, period_to,
+                 excel_data, calculations, template_path, output_path, year_to, progress):
+    """Background task: commit the invoice to the database and write its Excel file"""
+    # Insert invoice data, register devices and mark inventory invoiced in one transaction
+    commit_invoice(invoice_record, invoice_rows, year, period_from, period_to, year_to=year_to)
+
+    progress(60, "Writing Excel invoice...")
+    excel_generator = ExcelInvoiceGenerator(template_path)
+    excel_generator.generate_invoice(excel_data, calculations)
+    excel_generator.save(output_path)
+    return output_path
+
 class InvoiceForm(QWidget):
     def __init__(self):
         super().__init__()
-        self.sellers_data = {}
+        self.tasks = TaskRunner(self)
+        self.draft = None
+        self.current_invoice_data = None
+        self.current_calculations = None
+        self.current_registered_devices = None
+        self.tasks.busy_changed.connect(self.on_busy_changed)
+        self.tasks.progress.connect(self.on_task_progress)
         self.init_ui()
         self.load_sellers_data()
         
@@ -77,17 +132,28 @@ class InvoiceForm(QWidget):
         self.select_all_checkbox.stateChanged.connect(self.on_select_all_changed)
         devices_layout.addWidget(self.select_all_checkbox)
         
-        # Scroll area for device checkboxes
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        scroll.setMinimumHeight(150)
+        # Incremental search over device IDs
+        self.device_search = QLineEdit()
+        self.device_search.setPlaceholderText("Search devices...")
+        self.device_search.setClearButtonEnabled(True)
+        devices_layout.addWidget(self.device_search)
+        
+        # Checkable device list; only visible rows are rendered
+        self.device_model = DeviceListModel(self)
+        self.device_proxy = DeviceFilterProxyModel(self)
+        self.device_proxy.setSourceModel(self.device_model)
+        self.device_search.textChanged.connect(self.device_proxy.set_search_text)
         
-        self.devices_container = QWidget()
-        self.devices_layout = QVBoxLayout()
-        self.devices_container.setLayout(self.devices_layout)
-        scroll.setWidget(self.devices_container)
+        self.devices_view = QListView()
+        self.devices_view.setModel(self.device_proxy)
+        self.devices_view.setUniformItemSizes(True)
+        self.devices_view.setMinimumHeight(150)
+        devices_layout.addWidget(self.devices_view)
+        
+        self.devices_count_label = QLabel("")
+        self.device_model.selection_changed.connect(self.on_device_selection_changed)
+        devices_layout.addWidget(self.devices_count_label)
         
-        devices_layout.addWidget(scroll)
         self.devices_group.setLayout(devices_layout)
         form_layout.addRow(self.devices_group)
         
@@ -113,6 +179,20 @@ class InvoiceForm(QWidget):
         self.period_to_combo.addItems(months)
         form_layout.addRow('Period To:', self.period_to_combo)
         
+        # Year of Period To, for periods that run into the next year (e.g. April to March)
+        self.year_to_combo = QComboBox()
+        for year in range(2022, current_year + 2):
+            self.year_to_combo.addItem(str(year))
+        form_layout.addRow('Period To Year:', self.year_to_combo)
+        self.year_combo.currentTextChanged.connect(self.on_year_changed)
+        
+        # Resulting period, so a span into another year is visible before generating
+        self.period_span_label = QLabel()
+        form_layout.addRow('Invoice Period:', self.period_span_label)
+        for combo in (self.year_combo, self.period_from_combo, self.period_to_combo, self.year_to_combo):
+            combo.currentTextChanged.connect(self.update_period_span)
+        self.update_period_span()
+        
         # Unit Sale Price
         self.unit_price_spin = QDoubleSpinBox()
         self.unit_price_spin.setMaximum(999999.9999)
@@ -140,6 +220,15 @@ class InvoiceForm(QWidget):
         self.remove_fees_checkbox = QCheckBox('Remove Fees')
         form_layout.addRow('', self.remove_fees_checkbox)
         
+        # Price, rate and fee changes recalculate the current draft without querying the database
+        self.recalc_timer = QTimer(self)
+        self.recalc_timer.setSingleShot(True)
+        self.recalc_timer.setInterval(RECALC_DEBOUNCE_MS)
+        self.recalc_timer.timeout.connect(self.recalculate)
+        for spin in (self.unit_price_spin, self.success_fee_spin, self.usd_rate_spin, self.eur_rate_spin):
+            spin.valueChanged.connect(lambda _: self.recalc_timer.start())
+        self.remove_fees_checkbox.toggled.connect(lambda _: self.recalc_timer.start())
+        
         # Button container
         button_container = QWidget()
         button_layout = QHBoxLayout()
@@ -164,6 +253,28 @@ class InvoiceForm(QWidget):
         button_container.setLayout(button_layout)
         form_layout.addRow('', button_container)
         
+        # Busy indicator for background database and file work
+        status_container = QWidget()
+        status_layout = QHBoxLayout()
+        status_layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 0)  # Indeterminate until a task reports progress
+        self.progress_bar.setTextVisible(False)
+        status_layout.addWidget(self.progress_bar)
+        
+        self.status_label = QLabel('')
+        status_layout.addWidget(self.status_label)
+        
+        self.cancel_btn = QPushButton('Cancel')
+        self.cancel_btn.clicked.connect(self.on_cancel_clicked)
+        status_layout.addWidget(self.cancel_btn)
+        
+        status_container.setLayout(status_layout)
+        form_layout.addRow('', status_container)
+        self.status_container = status_container
+        self.status_container.hide()
+        
         form_container.setLayout(form_layout)
         
         # Preview layout (right side)
@@ -175,19 +286,34 @@ class InvoiceForm(QWidget):
         preview_label.setAlignment(Qt.AlignCenter)
         preview_layout.addWidget(preview_label)
         
-        # Create text browser for preview with expanded width
-        self.preview_text = QTextBrowser()
-        self.preview_text.setMinimumWidth(500)  # Increased minimum width
-        self.preview_text.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)  # Allow expanding
-        self.preview_text.setStyleSheet("""
-            QTextBrowser {
-                background-color: white;
-                padding: 0px;
-                margin: 0px;
-                border: none;
-            }
-        """)
-        preview_layout.addWidget(self.preview_text)
+        # Fixed summary panel: one label per figure, updated in place on each generate
+        summary_group = QGroupBox()
+        summary_layout = QFormLayout()
+        self.summary_labels = {}
+        for section, fields in PREVIEW_SUMMARY:
+            section_label = QLabel(section)
+            section_label.setStyleSheet("font-weight: bold; text-transform: uppercase;")
+            summary_layout.addRow(section_label)
+            for title, key, _, suffix in fields:
+                value_label = QLabel("-")
+                value_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                summary_layout.addRow(title, value_label)
+                self.summary_labels[key] = value_label
+        summary_group.setLayout(summary_layout)
+        preview_layout.addWidget(summary_group)
+        
+        # Device x month details, rendered lazily by the view
+        self.preview_model = InvoicePreviewModel(self)
+        self.preview_table = QTableView()
+        self.preview_table.setModel(self.preview_model)
+        self.preview_table.setMinimumWidth(500)  # Increased minimum width
+        self.preview_table.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)  # Allow expanding
+        self.preview_table.setAlternatingRowColors(True)
+        self.preview_table.verticalHeader().hide()
+        self.preview_table.verticalHeader().setDefaultSectionSize(22)
+        self.preview_table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.preview_table.horizontalHeader().setStretchLastSection(True)
+        preview_layout.addWidget(self.preview_table)
         
         preview_container.setLayout(preview_layout)
         
@@ -197,118 +323,265 @@ class InvoiceForm(QWidget):
         
         self.setLayout(main_layout)
 
-    def load_sellers_data(self):
-        """Load sellers data from database and populate dropdowns"""
+    def on_busy_changed(self, busy):
+        """Show the busy indicator and lock the action buttons while background work runs"""
+        self.status_container.setVisible(busy)
+        self.cancel_btn.setEnabled(self.tasks.can_cancel())
+        has_results = self.current_invoice_data is not None and self.current_calculations is not None
+        self.generate_btn.setEnabled(not busy)
+        self.download_btn.setEnabled(not busy and has_results)
+        self.confirm_download_btn.setEnabled(not busy and has_results and not self.draft.invoiced)
+        if not busy:
+            self.status_label.setText('')
+            self.progress_bar.setRange(0, 0)
+
+    def on_task_progress(self, percent, message):
+        """Update the busy indicator from a background task"""
+        if message:
+            self.status_label.setText(message)
+        if percent > 0:
+            self.progress_bar.setRange(0, 100)
+            self.progress_bar.setValue(percent)
+        else:
+            self.progress_bar.setRange(0, 0)
+        self.cancel_btn.setEnabled(self.tasks.can_cancel())
+
+    def on_cancel_clicked(self):
+        """Cancel running background tasks; their results are discarded"""
+        self.tasks.cancel()
+
+    def on_year_changed(self, year):
+        """Reset the period's end year to the start year; a later end year must be picked explicitly"""
+        self.year_to_combo.setCurrentText(year)
+
+    def get_period_span(self):
+        """Describe the selected period, e.g. 'January 2023 - March 2024 (15 months)'"""
+        year = int(self.year_combo.currentText())
+        year_to = int(self.year_to_combo.currentText())
+        period_from = self.period_from_combo.currentText()
+        period_to = self.period_to_combo.currentText()
+        months = len(get_period_months(year, period_from, period_to, year_to))
+        return f"{period_from} {year} - {period_to} {year_to} ({months} month{'s' if months != 1 else ''})"
+
+    def update_period_span(self, *_):
         try:
-            self.sellers_data = get_all_sellers_data()
-            logger.info("Successfully retrieved sellers data")
-            logger.info(f"Groups found: {list(self.sellers_data.keys())}")
-            
-            # Populate group dropdown
-            self.group_name_combo.clear()
-            self.group_name_combo.addItems(sorted(self.sellers_data.keys()))
-            
-        except Exception as e:
-            logger.error(f"Error loading sellers data: {str(e)}")
+            self.period_span_label.setText(self.get_period_span())
+        except ValueError:
+            self.period_span_label.setText("Period ends before it starts")
+
+    def load_sellers_data(self):
+        """Show the sellers snapshot right away, then revalidate it against the database in the background"""
+        if sellers_cache.load_snapshot():
+            logger.info("Loaded sellers data from snapshot")
+            self.on_sellers_loaded(True)
+        self.tasks.run(
+            'sellers',
+            sellers_cache.refresh,
+            on_result=self.on_sellers_loaded,
+            on_error=lambda e: logger.error(f"Error loading sellers data: {str(e)}"),
+            message="Loading sellers..."
+        )
+
+    def on_sellers_loaded(self, changed):
+        """Populate dropdowns with the cached sellers data if it changed"""
+        if not changed:
+            return
+        groups = sorted(sellers_cache.groups())
+        logger.info("Successfully retrieved sellers data")
+        logger.info(f"Groups found: {groups}")
+        
+        # Populate group dropdown, keeping the current selection when it still exists
+        current_group = self.group_name_combo.currentText()
+        current_company = self.company_name_combo.currentText()
+        self.group_name_combo.blockSignals(True)
+        self.group_name_combo.clear()
+        self.group_name_combo.addItems(groups)
+        if current_group in groups:
+            self.group_name_combo.setCurrentText(current_group)
+        self.group_name_combo.blockSignals(False)
+        self.on_group_changed(self.group_name_combo.currentText())
+        if sellers_cache.get(self.group_name_combo.currentText(), current_company):
+            self.company_name_combo.setCurrentText(current_company)
 
     def on_group_changed(self, group_name):
         """Handle group selection change"""
         self.company_name_combo.clear()
-        if group_name in self.sellers_data:
-            companies = [seller["seller"] for seller in self.sellers_data[group_name]]
+        sellers = sellers_cache.sellers(group_name)
+        companies = [seller["seller"] for seller in sellers]
+        if companies:
             logger.info(f"Companies for group {group_name}: {companies}")
             self.company_name_combo.addItems(companies)
+        if sellers and os.getenv('DEVICE_PREFETCH', '1') != '0':
+            # Switching between the group's companies is then served from the device cache
+            self.tasks.run(
+                'prefetch',
+                prefetch_devices,
+                [seller["pan"] for seller in sellers],
+                on_result=lambda count: logger.info(f"Prefetched device lists for {count} PANs in {group_name}"),
+                on_error=lambda e: logger.warning(f"Device prefetch failed: {str(e)}"),
+                message=f"Loading devices for {group_name}..."
+            )
 
     def on_company_changed(self, company_name):
         """Handle company selection change"""
         group_name = self.group_name_combo.currentText()
-        if group_name in self.sellers_data:
-            for seller in self.sellers_data[group_name]:
-                if seller["seller"] == company_name:
-                    logger.info(f"Setting values for {company_name}")
-                    self.success_fee_spin.setValue(float(seller["success_fee"]))
-                    self.unit_price_spin.setValue(float(seller["indicative_price"]))
-                    
-                    # Get and display device IDs
-                    self.load_devices(company_name, group_name)
-                    break
+        seller = sellers_cache.get(group_name, company_name)
+        if seller:
+            logger.info(f"Setting values for {company_name}")
+            self.success_fee_spin.setValue(float(seller["success_fee"]))
+            self.unit_price_spin.setValue(float(seller["indicative_price"]))
+            
+            # Get and display device IDs
+            self.load_devices(company_name, group_name)
 
     def load_devices(self, company_name, group_name):
-        """Load and display device checkboxes"""
+        """Clear the device list and load the company's devices in the background"""
         try:
-            # Clear existing checkboxes
-            for i in reversed(range(self.devices_layout.count())):
-                self.devices_layout.itemAt(i).widget().setParent(None)
+            # Clear existing devices; a draft of the previous company no longer applies
+            self.clear_results()
+            self.device_model.set_devices([])
+            self.devices_group.hide()
             
             # Get seller info for the selected company
-            seller_info = next(
-                seller for seller in self.sellers_data[group_name] 
-                if seller["seller"] == company_name
-            )
+            seller_info = sellers_cache.get(group_name, company_name)
             
             # Get PAN number from seller info
-            pan = seller_info["pan"]
+            pan = seller_info["pan"] if seller_info else None
             if not pan:
                 logger.error(f"No PAN found for {company_name}")
-                self.devices_group.hide()
                 return
                 
-            # Get device IDs
-            devices = get_devices_by_pan(pan)
-            if not devices:
-                logger.info(f"No devices found for PAN: {pan}")
-                self.devices_group.hide()
+            # Cached device lists are shown without touching the database
+            devices = device_cache.get(pan)
+            if devices is not None:
+                self.tasks.cancel('devices')
+                self.on_devices_loaded(company_name, pan, devices)
                 return
                 
-            # Show devices group and add checkboxes
-            self.devices_group.show()
-            for device_id in devices:
-                checkbox = QCheckBox(device_id)
-                self.devices_layout.addWidget(checkbox)
-                
-            logger.info(f"Loaded {len(devices)} devices for {company_name}")
+            # Get device IDs; a newer company selection cancels this one
+            self.tasks.run(
+                'devices',
+                get_devices_by_pan,
+                pan,
+                on_result=lambda devices: self.on_devices_loaded(company_name, pan, devices),
+                on_error=lambda e: logger.error(f"Error loading devices: {str(e)}"),
+                message=f"Loading devices for {company_name}..."
+            )
             
         except Exception as e:
             logger.error(f"Error loading devices: {str(e)}")
+
+    def clear_results(self):
+        """Drop the draft and its displayed results, and discard a generate still running"""
+        self.tasks.cancel('generate')
+        self.draft = None
+        self.current_invoice_data = None
+        self.current_calculations = None
+        self.current_registered_devices = None
+        self.preview_model.clear()
+        for label in self.summary_labels.values():
+            label.setText("")
+        self.download_btn.setEnabled(False)
+        self.confirm_download_btn.setEnabled(False)
+
+    def on_devices_loaded(self, company_name, pan, devices):
+        """Display the loaded device IDs in the device list"""
+        if not devices:
+            logger.info(f"No devices found for PAN: {pan}")
             self.devices_group.hide()
+            return
+            
+        # Show devices group with a fresh, unchecked list
+        self.select_all_checkbox.blockSignals(True)
+        self.select_all_checkbox.setChecked(False)
+        self.select_all_checkbox.blockSignals(False)
+        self.device_search.clear()
+        self.device_model.set_devices(devices)
+        self.devices_group.show()
+            
+        logger.info(f"Loaded {len(devices)} devices for {company_name}")
 
     def on_select_all_changed(self, state):
         """Handle select all checkbox state change"""
-        for i in range(self.devices_layout.count()):
-            checkbox = self.devices_layout.itemAt(i).widget()
-            if isinstance(checkbox, QCheckBox):
-                checkbox.setChecked(state == Qt.Checked)
+        if self.device_search.text().strip():
+            # With a search active, only the matching devices are toggled
+            self.device_model.set_checked(self.device_proxy.visible_source_rows(), state == Qt.Checked)
+        else:
+            self.device_model.set_all_checked(state == Qt.Checked)
+
+    def on_device_selection_changed(self):
+        total = self.device_model.rowCount()
+        self.devices_count_label.setText(f"{self.device_model.selected_count()} of {total} selected")
 
     def get_selected_devices(self):
         """Get list of selected device IDs"""
-        selected = []
-        for i in range(self.devices_layout.count()):
-            checkbox = self.devices_layout.itemAt(i).widget()
-            if isinstance(checkbox, QCheckBox) and checkbox.isChecked():
-                selected.append(checkbox.text())
-        return selected
+        return self.device_model.selected_devices()
 
     def on_generate_clicked(self):
         """Handle generate invoice button click"""
+        # Get selected devices
+        selected_devices = self.get_selected_devices()
+        if not selected_devices:
+            QMessageBox.warning(self, "Warning", "Please select at least one device.")
+            return
+        
+        # Get form data
+        group_name = self.group_name_combo.currentText()
+        company_name = self.company_name_combo.currentText()
+        year = int(self.year_combo.currentText())
+        year_to = int(self.year_to_combo.currentText())
+        period_from = self.period_from_combo.currentText()
+        period_to = self.period_to_combo.currentText()
         try:
-            # Get selected devices
-            selected_devices = self.get_selected_devices()
-            if not selected_devices:
-                QMessageBox.warning(self, "Warning", "Please select at least one device.")
-                return
-            
-            # Get form data
-            year = int(self.year_combo.currentText())
-            period_from = self.period_from_combo.currentText()
-            period_to = self.period_to_combo.currentText()
-            
-            # Get invoice data
-            invoice_data = get_invoice_data(
-                selected_devices,
-                year,
-                period_from,
-                period_to
+            get_period_months(year, period_from, period_to, year_to)
+        except ValueError as e:
+            QMessageBox.warning(self, "Warning", str(e))
+            return
+        
+        # Same devices and period: recalculate the draft instead of querying again
+        if self.draft is not None and self.draft.matches(selected_devices, year, period_from, period_to, year_to):
+            self.recalculate()
+            return
+        
+        # A period into another year is confirmed before it is fetched
+        if year_to != year:
+            answer = QMessageBox.question(
+                self,
+                "Cross-Year Period",
+                f"The invoice period runs from {self.get_period_span()}. Continue?"
             )
+            if answer != QMessageBox.Yes:
+                return
+        
+        # Get invoice data and registration status off the GUI thread
+        self.tasks.run(
+            'generate',
+            fetch_invoice_data,
+            selected_devices,
+            year,
+            period_from,
+            period_to,
+            year_to,
+            on_result=lambda result: self.on_invoice_data_loaded(
+                result, selected_devices, year, period_from, period_to, year_to, group_name, company_name
+            ),
+            on_error=self.on_generate_failed,
+            message="Fetching invoice data..."
+        )
+
+    def on_generate_failed(self, error):
+        logger.error(f"Error generating invoice: {str(error)}")
+        QMessageBox.critical(
+            self,
+            "Error",
+            f"Failed to generate invoice: {str(error)}"
+        )
+
+    def on_invoice_data_loaded(self, result, device_ids, year, period_from, period_to, year_to,
+                               group_name, company_name):
+        """Resolve partial issues, calculate and display the fetched invoice data"""
+        try:
+            invoice_data, registered_devices = result
             
             if not invoice_data:
                 QMessageBox.warning(
@@ -319,17 +592,18 @@ class InvoiceForm(QWidget):
                 return
 
             # Check for partial issues
+            period_months = get_period_months(year, period_from, period_to, year_to)
             partial_issues = []
             for data in invoice_data:
-                for month in get_months_between(period_from, period_to):
-                    if data.get(f"{month}IsPartial", False):
-                        issue_process = eval(data[f"{month}IssueProcess"])
+                for month_year, month in period_months:
+                    month_key = get_month_key(month_year, month)
+                    if data.get(f"{month_key}IsPartial", False):
                         partial_issues.append({
                             'device_id': data['Device ID'],
-                            'year': year,
+                            'year': month_year,
                             'month': month,
-                            'default_value': data[f"{month}Issued"],
-                            'issue_process': issue_process
+                            'default_value': data[f"{month_key}Issued"],
+                            'issue_process': data[f"{month_key}IssueProcess"]  # Parsed once by the query layer
                         })
             
             # If partial issues exist, show modal
@@ -344,36 +618,25 @@ class InvoiceForm(QWidget):
                 # Update invoice data with selected values
                 for data in invoice_data:
                     # First update the monthly values for partial issues
-                    for month in get_months_between(period_from, period_to):
-                        key = f"{data['Device ID']}_{month}"
+                    for month_year, month in period_months:
+                        key = f"{data['Device ID']}_{month_year}_{month}"
                         if key in selected_values:
-                            data[f"{month}Issued"] = float(selected_values[key])
+                            data[f"{get_month_key(month_year, month)}Issued"] = selected_values[key]
                     
                     # Now recalculate TotalIssued for all devices
-                    total_issued = Decimal('0.0000')
-                    for month in get_months_between(period_from, period_to):
+                    total_issued = ZERO
+                    for month_year, month in period_months:
                         # Sum up all months' values, whether they were partial or not
-                        month_value = data.get(f"{month}Issued", 0)
-                        total_issued += Decimal(str(month_value))
+                        total_issued += to_decimal(data.get(f"{get_month_key(month_year, month)}Issued"))
                     
                     # Update the total issued for this device
-                    data['TotalIssued'] = float(total_issued)
-                    logger.info(f"Updated TotalIssued for {data['Device ID']}: {float(total_issued)}")
-
-            # Get registered devices
-            device_ids = ','.join(d['Device ID'] for d in invoice_data)
-            registered_devices = get_registered_devices(device_ids)
+                    data['TotalIssued'] = total_issued
+                    logger.info(f"Updated TotalIssued for {data['Device ID']}: {format_amount(total_issued)}")
             
-            # Calculate invoice amounts
-            calculations = InvoiceCalculator.calculate_invoice_amounts(
-                invoice_data,
-                registered_devices,
-                self.unit_price_spin.value(),
-                0 if self.remove_fees_checkbox.isChecked() else self.success_fee_spin.value(),
-                self.usd_rate_spin.value(),
-                self.eur_rate_spin.value(),
-                self.remove_fees_checkbox.isChecked()
-            )
+            # Keep the fetched data as a draft and calculate invoice amounts from it
+            self.draft = InvoiceDraft(device_ids, year, period_from, period_to, invoice_data, registered_devices,
+                                      year_to, group_name, company_name)
+            calculations = self.calculate_draft()
                 
             # Enable both download buttons after successful generation
             self.download_btn.setEnabled(True)
@@ -385,467 +648,232 @@ class InvoiceForm(QWidget):
             # Store data for PDF and Excel generation
             self.current_invoice_data = invoice_data
             self.current_calculations = calculations
+            self.current_registered_devices = registered_devices
             
         except Exception as e:
-            logger.error(f"Error generating invoice: {str(e)}")
-            QMessageBox.critical(
-                self,
-                "Error",
-                f"Failed to generate invoice: {str(e)}"
-            )
+            self.on_generate_failed(e)
+
+    def calculate_draft(self):
+        """Calculate the draft's invoice amounts from the current form values"""
+        return self.draft.calculate(
+            self.unit_price_spin.value(),
+            self.success_fee_spin.value(),
+            self.usd_rate_spin.value(),
+            self.eur_rate_spin.value(),
+            self.remove_fees_checkbox.isChecked()
+        )
+
+    def recalculate(self):
+        """Recalculate and redisplay the current draft after a price, rate or fee change"""
+        self.recalc_timer.stop()
+        if self.draft is None:
+            return
+        self.current_calculations = self.calculate_draft()
+        self.display_summary(self.current_calculations)
+
+    def flush_recalculation(self):
+        """Apply a pending debounced recalculation before its results are used"""
+        if self.recalc_timer.isActive():
+            self.recalculate()
 
     def on_download_clicked(self):
         """Handle download worksheet button click"""
+        self.flush_recalculation()
         try:
-            if not hasattr(self, 'current_invoice_data') or not hasattr(self, 'current_calculations'):
+            if self.current_invoice_data is None or self.current_calculations is None:
                 QMessageBox.warning(self, "Warning", "Please generate invoice data first.")
                 return
                 
-            # Get company and group names for directory
-            company_name = self.company_name_combo.currentText()
-            group_name = self.group_name_combo.currentText()
-            year = self.year_combo.currentText()
+            # Company, group and year the displayed data was generated for
+            company_name = self.draft.company_name
+            group_name = self.draft.group_name
+            year = str(self.draft.year)
             
             # Create directory structure for Worksheet
-            worksheet_base_dir = os.path.join(os.getcwd(), "Worksheet", group_name, company_name, year)
-            if not os.path.exists(worksheet_base_dir):
-                os.makedirs(worksheet_base_dir)
+            worksheet_base_dir = get_output_dir(os.getcwd(), "Worksheet", group_name, company_name, year)
                 
             # Save file in company-specific directory
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"invoice_worksheet_{timestamp}.pdf"
             filepath = os.path.join(worksheet_base_dir, filename)
             
-            self.generate_worksheet_pdf(filepath)
-            
-            QMessageBox.information(
-                self,
-                "Success",
-                f"Worksheet saved to: {filepath}"
+            self.tasks.run(
+                'worksheet',
+                generate_worksheet_pdf,
+                filepath,
+                group_name,
+                company_name,
+                self.current_invoice_data,
+                self.current_calculations,
+                on_result=lambda _: QMessageBox.information(
+                    self,
+                    "Success",
+                    f"Worksheet saved to: {filepath}"
+                ),
+                on_error=self.on_download_failed,
+                message="Writing worksheet PDF..."
             )
             
         except Exception as e:
-            logger.error(f"Error generating PDF: {str(e)}")
-            QMessageBox.critical(
-                self,
-                "Error",
-                f"Failed to generate PDF: {str(e)}"
-            )
+            self.on_download_failed(e)
+
+    def on_download_failed(self, error):
+        logger.error(f"Error generating PDF: {str(error)}")
+        QMessageBox.critical(
+            self,
+            "Error",
+            f"Failed to generate PDF: {str(error)}"
+        )
 
     def on_confirm_download_clicked(self):
         """Handle confirm and download button click"""
+        self.flush_recalculation()
         try:
-            if not hasattr(self, 'current_invoice_data') or not hasattr(self, 'current_calculations'):
+            if self.current_invoice_data is None or self.current_calculations is None:
                 QMessageBox.warning(self, "Warning", "Please generate invoice data first.")
                 return
+            draft = self.draft
+            if draft.invoiced:
+                QMessageBox.warning(self, "Warning", "This invoice was already saved. Please generate it again.")
+                return
 
-            # Get company and group names for directory
-            group_name = self.group_name_combo.currentText()
-            company_name = self.company_name_combo.currentText()
-            selected_year = self.year_combo.currentText()
+            # Company, group and period the displayed data was generated for, not the current selection
+            group_name = draft.group_name
+            company_name = draft.company_name
+            selected_year = str(draft.year)
             
             # Create directory structure for Invoices
-            invoice_base_dir = os.path.join(os.getcwd(), "Invoices", group_name, company_name, selected_year)
-            if not os.path.exists(invoice_base_dir):
-                os.makedirs(invoice_base_dir)
-
-            # Get seller details directly from sellers_data
-            seller_info = next(
-                seller for seller in self.sellers_data[group_name] 
-                if seller["seller"] == company_name
-            )
+            invoice_base_dir = get_output_dir(os.getcwd(), "Invoices", group_name, company_name, selected_year)
+
+            # Get seller details from the sellers index
+            seller_info = sellers_cache.get(group_name, company_name)
+            if seller_info is None:
+                raise ValueError(f"Unknown company {company_name} in group {group_name}")
             
             # Get all unique projects from invoice data
-            projects = list(set(device['Project'] for device in self.current_invoice_data))
-            project_text = ' and '.join(projects)
+            project_text = get_project_text(self.current_invoice_data)
             
-            # Get selected year and device IDs
-            selected_year = self.year_combo.currentText()
+            # Get device IDs
             device_ids = [device['Device ID'] for device in self.current_invoice_data]
-            device_ids_str = ','.join(device_ids)
             
-            # Get registered devices and find unregistered ones
-            registered_devices = get_registered_devices(device_ids).split(',') if get_registered_devices(device_ids) else []
+            # Find unregistered devices from the registration status fetched on generate
+            registered_devices = self.current_registered_devices
             unregistered_devices = [d for d in device_ids if d not in registered_devices]
-            unregistered_devices_str = ','.join(unregistered_devices)
+            logger.info(f"Registration lookups so far: {get_registration_stats()}")
             
             # Format dates
-            period_from = self.period_from_combo.currentText()
-            period_to = self.period_to_combo.currentText()
-            current_date = datetime.now().strftime("%d-%m-%Y")
-            
-            # Generate invoice ID using nanoid
-            invoice_id = generate(size=21)  # Default nanoid length
+            period_from = draft.period_from
+            period_to = draft.period_to
+            year_to = str(draft.year_to)
             
             # Prepare invoice data for database
-            invoice_data = {
-                'invoiceid': invoice_id,
-                'groupName': group_name,
-                'capacity': self.current_calculations['capacity'],
-                'regNo': len(device_ids),  # Total number of devices
-                'regdevice': unregistered_devices_str,  # Only unregistered devices
-                'issued': self.current_calculations['total_issued'],
-                'ISP': self.unit_price_spin.value(),
-                'registrationFee': self.current_calculations['registration_fee'],
-                'issuanceFee': self.current_calculations['issuance_fee'],
-                'USDExchange': self.usd_rate_spin.value(),
-                'EURExchange': self.eur_rate_spin.value(),
-                'invoicePeriodFrom': f"01-{datetime.strptime(period_from, '%B').strftime('%m')}-{selected_year}",
-                'invoicePeriodTo': f"31-{datetime.strptime(period_to, '%B').strftime('%m')}-{selected_year}",
-                'gross': self.current_calculations['gross_amount'],
-                'regFeeINR': self.current_calculations['reg_fee_inr'],
-                'issuanceINR': self.current_calculations['issuance_fee_inr'],
-                'netRevenue': self.current_calculations['net_revenue'],
-                'successFee': self.current_calculations['success_fee'],
-                'finalRevenue': self.current_calculations['final_revenue'],
-                'project': project_text,
-                'netRate': self.current_calculations['net_rate'],
-                'pan': seller_info['pan'],
-                'gst': seller_info['gst'],
-                'address': seller_info['address'],
-                'date': current_date,
-                'deviceIds': device_ids_str,
-                'companyName': company_name
-            }
-            
-            try:
-                # Insert invoice data
-                insert_invoice_data(invoice_data)
-                
-                # Register devices
-                register_devices(device_ids)
-                
-                logger.info("Successfully inserted invoice data and registered devices")
-            except Exception as e:
-                logger.error(f"Database operation failed: {str(e)}")
-                QMessageBox.critical(
-                    self,
-                    "Error",
-                    "Failed to save invoice data to database. Please try again."
-                )
-                return
+            from nanoid import generate
+            invoice_data = build_invoice_record(
+                generate(size=21),  # Default nanoid length
+                group_name,
+                company_name,
+                seller_info,
+                self.current_calculations,
+                device_ids,
+                unregistered_devices,
+                self.unit_price_spin.value(),
+                self.usd_rate_spin.value(),
+                self.eur_rate_spin.value(),
+                selected_year,
+                period_from,
+                period_to,
+                project_text,
+                year_to
+            )
             
             # Prepare data for Excel generation
-            excel_data = {
-                'company_name': company_name,
-                'pan': seller_info['pan'],
-                'gst': seller_info['gst'],
-                'address': seller_info['address'],
-                'period_from': period_from,
-                'period_to': period_to,
-                'project': project_text,
-                'year': selected_year
-            }
-
-            # Initialize Excel generator with template
-            template_path = self.resource_path(os.path.join("src", "public", "template.xlsx"))
-            excel_generator = ExcelInvoiceGenerator(template_path)
+            excel_data = build_excel_data(
+                company_name, seller_info, period_from, period_to, project_text, selected_year, year_to
+            )
 
-            # Generate Excel invoice
+            template_path = self.resource_path(os.path.join("src", "public", "template.xlsx"))
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_path = os.path.join(invoice_base_dir, f"invoice_{timestamp}.xlsx")
             
-            excel_generator.generate_invoice(excel_data, self.current_calculations)
-            excel_generator.save(output_path)
-
-            QMessageBox.information(
-                self,
-                "Success",
-                f"Invoice data saved and Excel file generated at: {output_path}"
+            # Save to the database and write the Excel file in the background.
+            # Not cancellable: once the commit starts it must be reported.
+            self.tasks.run(
+                'confirm',
+                save_invoice,
+                invoice_data,
+                self.current_invoice_data,
+                int(selected_year),
+                period_from,
+                period_to,
+                excel_data,
+                self.current_calculations,
+                template_path,
+                output_path,
+                int(year_to),
+                on_result=lambda path: self.on_invoice_saved(path, draft),
+                on_error=lambda e: self.on_confirm_failed(e, draft),
+                message="Saving invoice...",
+                with_progress=True,
+                cancellable=False
             )
 
         except Exception as e:
-            logger.error(f"Error in confirm and download: {str(e)}")
-            QMessageBox.critical(
+            self.on_confirm_failed(e)
+
+    def on_invoice_saved(self, output_path, draft):
+        logger.info("Successfully inserted invoice data and registered devices")
+        draft.invoiced = True  # Its inventory is invoiced now; generate must fetch again
+        self.confirm_download_btn.setEnabled(False)
+        QMessageBox.information(
+            self,
+            "Success",
+            f"Invoice data saved and Excel file generated at: {output_path}"
+        )
+
+    def on_confirm_failed(self, error, draft=None):
+        if isinstance(error, InvoiceConflictError):
+            logger.error(f"Invoice conflict: {str(error)}")
+            if draft is self.draft:
+                self.clear_results()  # Generate must fetch the inventory again
+            QMessageBox.warning(
                 self,
-                "Error",
-                f"Failed to process invoice: {str(e)}"
+                "Already Invoiced",
+                f"Some of these device-months were invoiced by another user. "
+                f"Please generate the calculations again.\n\n{str(error)}"
             )
-
-    def generate_worksheet_pdf(self, filepath):
-        """Generate PDF worksheet"""
-        doc = SimpleDocTemplate(filepath, pagesize=letter, leftMargin=15, rightMargin=15)  # Reduced margins
-        styles = getSampleStyleSheet()
-        elements = []
-        
-        # Get group name and company name
-        group_name = self.group_name_combo.currentText()
-        company_name = self.company_name_combo.currentText()
-        
-        # Title with group and company name
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            spaceAfter=30,
-            alignment=1  # Center alignment
+            return
+        if isinstance(error, PartialInvoiceError):
+            logger.error(f"Partial invoice refused: {str(error)}")
+            QMessageBox.warning(
+                self,
+                "Partial Issues",
+                f"A month can only be invoiced for its full issued amount. Generate again and "
+                f"select the default value, or clear the month to leave it for a later invoice.\n\n{str(error)}"
+            )
+            return
+        logger.error(f"Error in confirm and download: {str(error)}")
+        QMessageBox.critical(
+            self,
+            "Error",
+            f"Failed to process invoice: {str(error)}"
         )
-        elements.append(Paragraph(f"{group_name} - {company_name}", title_style))
-        
-        # Create one main table for all data
-        table_data = []
-        
-        # Device Information section
-        table_data.extend([
-            [Paragraph("<b>Device Information</b>", styles['Heading2']), ""],
-            ["Total Devices", str(self.current_calculations['total_devices'])],
-            ["Total Capacity (MW)", f"{self.current_calculations['capacity']:.2f}"],
-            ["Total Issued", f"{self.current_calculations['total_issued']:.4f}"],
-            ["", ""],  # Empty row for spacing
-        ])
-        
-        # Fees section
-        table_data.extend([
-            [Paragraph("<b>Fees</b>", styles['Heading2']), ""],
-            ["Registration Fee (EUR)", f"{self.current_calculations['registration_fee']:.2f}"],
-            ["Registration Fee (INR)", f"{self.current_calculations['reg_fee_inr']:.4f}"],
-            ["Issuance Fee (EUR)", f"{self.current_calculations['issuance_fee']:.4f}"],
-            ["Issuance Fee (INR)", f"{self.current_calculations['issuance_fee_inr']:.4f}"],
-            ["", ""],  # Empty row for spacing
-        ])
-        
-        # Revenue Calculations section
-        table_data.extend([
-            [Paragraph("<b>Revenue Calculations</b>", styles['Heading2']), ""],
-            ["Gross Amount (INR)", f"{self.current_calculations['gross_amount']:.4f}"],
-            ["Net Revenue (INR)", f"{self.current_calculations['net_revenue']:.4f}"],
-            ["Success Fee (INR)", f"{self.current_calculations['success_fee']:.4f}"],
-            ["Final Revenue (INR)", f"{self.current_calculations['final_revenue']:.4f}"],
-            ["Net Rate", f"{self.current_calculations['net_rate']:.4f}"],
-            ["", ""],  # Empty row for spacing
-        ])
-        
-        # Create the main table
-        main_table = Table(table_data, colWidths=[4*inch, 3*inch])
-        main_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),  # Header row
-            ('BACKGROUND', (0, 5), (-1, 5), colors.lightgrey),  # Fees header
-            ('BACKGROUND', (0, 11), (-1, 11), colors.lightgrey),  # Revenue header
-            ('PADDING', (0, 0), (-1, -1), 6),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),  # Right align all values in second column
-        ]))
-        elements.append(main_table)
-        elements.append(Spacer(1, 20))
-        
-        # Device Details with Monthly Issuance
-        elements.append(Paragraph("<b>Device Details</b>", styles['Heading2']))
-        
-        # Get all months from the first device's data
-        months = []
-        month_order = {
-            'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
-            'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
-        }
-        if self.current_invoice_data:
-            for key in self.current_invoice_data[0].keys():
-                if key.endswith('Issued') and key != 'TotalIssued':
-                    month = key.replace('Issued', '')
-                    month = month[:3].lower()  # Use lowercase 3-letter month abbreviations
-                    months.append(month)
-            months.sort(key=lambda x: month_order[x])  # Sort months chronologically
-        
-        # Create headers for the table
-        headers = ["Device ID"] + months + ["Tot"]
-        device_details = [headers]
-        
-        # Add data for each device
-        for device in self.current_invoice_data:
-            row = [device['Device ID']]
-            for month in months:
-                full_month = next(k.replace('Issued', '') for k in device.keys() 
-                                if k.endswith('Issued') and k.startswith(month))
-                month_key = f"{full_month}Issued"
-                value = device.get(month_key, 0)
-                row.append(f"{float(value):.2f}" if value else "0.00")
-            row.append(f"{float(device['TotalIssued']):.2f}")
-            device_details.append(row)
-        
-        # Calculate column widths based on number of columns
-        total_width = 7.8  # Total width in inches
-        device_id_width = 1.3  # Device ID column width
-        remaining_width = total_width - device_id_width
-        month_width = remaining_width / (len(months) + 1)  # +1 for Total column
-        col_widths = [device_id_width] + [month_width] * (len(months) + 1)
-        
-        details_table = Table(device_details, colWidths=[w*inch for w in col_widths])
-        details_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('PADDING', (0, 0), (-1, -1), 1),
-            ('FONTSIZE', (0, 0), (-1, -1), 5),
-            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
-            ('TOPPADDING', (0, 0), (-1, -1), 0),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
-            ('LEFTPADDING', (0, 0), (-1, -1), 2),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-        ]))
-        elements.append(details_table)
-        
-        # Build PDF
-        doc.build(elements)
 
     def display_invoice_data(self, invoice_data, calculations):
-        """Display invoice calculations in the preview"""
+        """Display invoice calculations in the summary panel and the devices in the preview table"""
         if not invoice_data:
             return
             
-        # Format the preview text with a single HTML table
-        preview_text = []
-        preview_text.append("""
-        <style>
-            body {
-                margin: 0;
-                padding: 0;
-            }
-            .main-container {
-                display: flex;
-                flex-direction: column;
-                align-items: center;
-                width: 100%;
-                padding: 0 20px;
-            }
-            .table-container {
-                width: 100%;
-                max-width: 800px;
-                margin: 0 auto;
-            }
-            table {
-                width: 100%;
-                border-collapse: collapse;
-                margin: 0 auto;
-                background-color: white;
-                box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-            }
-            th, td {
-                padding: 12px 15px;
-                border: 1px solid #ddd;
-                white-space: nowrap;
-                overflow: hidden;
-                text-overflow: ellipsis;
-            }
-            th {
-                background-color: #f5f5f5;
-                font-weight: bold;
-                text-align: center;
-                padding: 15px;
-                font-size: 14px;
-                text-transform: uppercase;
-            }
-            td:first-child {
-                width: 60%;
-                text-align: left;
-                padding-left: 20px;
-                font-size: 13px;
-            }
-            td:last-child {
-                width: 40%;
-                text-align: right;
-                padding-right: 20px;
-                font-size: 13px;
-            }
-            h3 {
-                text-align: center;
-                margin: 5px 0 15px 0;
-                padding: 0;
-                width: 100%;
-                font-size: 16px;
-            }
-            tr:hover {
-                background-color: #f9f9f9;
-            }
-        </style>
-        <div class="main-container">
-            <h3>Worksheet Calculations</h3>
-            <div class="table-container">
-        """)
-        
-        # Single comprehensive table
-        preview_text.append("""
-                <table>
-                    <tr>
-                        <th colspan='2'>Device Information</th>
-                    </tr>
-                    <tr>
-                        <td>Total Devices</td>
-                        <td>{}</td>
-                    </tr>
-                    <tr>
-                        <td>Total Capacity</td>
-                        <td>{:.2f} MW</td>
-                    </tr>
-                    <tr>
-                        <td>Total Issued</td>
-                        <td>{:.4f}</td>
-                    </tr>
-                    
-                    <tr>
-                        <th colspan='2'>Fees</th>
-                    </tr>
-                    <tr>
-                        <td>Registration Fee (EUR)</td>
-                        <td>{:.2f}</td>
-                    </tr>
-                    <tr>
-                        <td>Registration Fee (INR)</td>
-                        <td>{:.4f}</td>
-                    </tr>
-                    <tr>
-                        <td>Issuance Fee (EUR)</td>
-                        <td>{:.4f}</td>
-                    </tr>
-                    <tr>
-                        <td>Issuance Fee (INR)</td>
-                        <td>{:.4f}</td>
-                    </tr>
-                    
-                    <tr>
-                        <th colspan='2'>Revenue Calculation</th>
-                    </tr>
-                    <tr>
-                        <td>Gross Amount (INR)</td>
-                        <td>{:.4f}</td>
-                    </tr>
-                    <tr>
-                        <td>Net Revenue (INR)</td>
-                        <td>{:.4f}</td>
-                    </tr>
-                    <tr>
-                        <td>Success Fee (INR)</td>
-                        <td>{:.4f}</td>
-                    </tr>
-                    <tr>
-                        <td>Final Revenue (INR)</td>
-                        <td>{:.4f}</td>
-                    </tr>
-                    
-                    <tr>
-                        <th colspan='2'>Final Rate</th>
-                    </tr>
-                    <tr>
-                        <td>Net Rate</td>
-                        <td>{:.4f}</td>
-                    </tr>
-                </table>
-            </div>
-        </div>
-        """.format(
-            calculations['total_devices'],
-            calculations['capacity'],
-            calculations['total_issued'],
-            calculations['registration_fee'],
-            calculations['reg_fee_inr'],
-            calculations['issuance_fee'],
-            calculations['issuance_fee_inr'],
-            calculations['gross_amount'],
-            calculations['net_revenue'],
-            calculations['success_fee'],
-            calculations['final_revenue'],
-            calculations['net_rate']
-        ))
-        
-        # Set the HTML content
-        self.preview_text.setHtml("\n".join(preview_text)) 
+        self.display_summary(calculations)
+        self.preview_model.set_invoice_data(invoice_data)
+        self.preview_table.resizeColumnToContents(0)
+
+    def display_summary(self, calculations):
+        """Update the summary panel labels in place"""
+        for _, fields in PREVIEW_SUMMARY:
+            for _, key, places, suffix in fields:
+                value = calculations[key]
+                text = str(value) if places is None else format_amount(value, places)
+                self.summary_labels[key].setText(text + suffix)
 
 class PartialIssueModal(QDialog):
     def __init__(self, partial_issues_data, parent=None):
@@ -896,7 +924,7 @@ class PartialIssueModal(QDialog):
             checkbox_layout.setSpacing(5)  # Increased spacing between checkboxes
             
             # Convert default_value to Decimal
-            default_value = Decimal(str(data['default_value']))
+            default_value = to_decimal(data['default_value'])
             
             # Add default value checkbox
             default_checkbox = QCheckBox(f"Default ({default_value:.4f})")
@@ -907,13 +935,13 @@ class PartialIssueModal(QDialog):
             checkbox_layout.addWidget(default_checkbox)
             
             # Store checkboxes for this row
-            key = f"{data['device_id']}_{data['month']}"
+            key = f"{data['device_id']}_{data['year']}_{data['month']}"
             self.checkboxes[key] = [default_checkbox]
             
             # Add checkboxes for each value in issue_process
             for i, value in enumerate(data['issue_process']):
                 # Convert value to Decimal
-                decimal_value = Decimal(str(value))
+                decimal_value = to_decimal(value)
                 # Change "Value X" to "Issue X"
                 checkbox = QCheckBox(f"Issue {i+1} ({decimal_value:.4f})")
                 checkbox.setProperty('value', decimal_value)
@@ -961,10 +989,11 @@ class PartialIssueModal(QDialog):
         value = checkbox.property('value')
         is_default = checkbox.property('is_default')
         
-        # Get device_id and month for this row
+        # Get device_id, year and month for this row
         device_id = self.table.item(row, 0).text()
+        year = self.table.item(row, 1).text()
         month = self.table.item(row, 2).text()
-        key = f"{device_id}_{month}"
+        key = f"{device_id}_{year}_{month}"
         
         # Handle mutual exclusivity
         if state == Qt.Checked:
@@ -1,14 +1,19 @@
-from PyQt5.QtWidgets import QMainWindow, QWidget, QVBoxLayout
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QLabel
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from PyQt5.QtGui import QIcon
 import os
 import sys
-from .invoice_form import InvoiceForm
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    first_paint = pyqtSignal()
+    form_ready = pyqtSignal()
+
+    def __init__(self, defer_form=False):
         super().__init__()
-        self.init_ui()
+        self.invoice_form = None
+        self.loading_label = None
+        self._painted = False
+        self.init_ui(defer_form)
 
     def resource_path(self, relative_path):
         """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -19,7 +24,7 @@ class MainWindow(QMainWindow):
             base_path = os.path.abspath(".")
         return os.path.join(base_path, relative_path)
 
-    def init_ui(self):
+    def init_ui(self, defer_form=False):
         self.setWindowTitle('Solaura Invoice Generator')
         self.setMinimumSize(1200, 800)
 
@@ -33,11 +38,34 @@ class MainWindow(QMainWindow):
         # Create central widget and layout
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
-        layout = QVBoxLayout(central_widget)
+        self.main_layout = QVBoxLayout(central_widget)
         
-        # Create and add invoice form
-        self.invoice_form = InvoiceForm()
-        layout.addWidget(self.invoice_form)
+        # The invoice form pulls in the database stack, so it can be built after the window is painted
+        if defer_form:
+            self.loading_label = QLabel("Loading...")
+            self.loading_label.setAlignment(Qt.AlignCenter)
+            self.main_layout.addWidget(self.loading_label)
+        else:
+            self.load_form()
         
         # Center the window
-        self.setGeometry(100, 100, 1200, 800) 
\ No newline at end of file
+        self.setGeometry(100, 100, 1200, 800)
+
+    def load_form(self):
+        """Create and add the invoice form"""
+        from .invoice_form import InvoiceForm
+        self.invoice_form = InvoiceForm()
+        if self.loading_label is not None:
+            self.main_layout.removeWidget(self.loading_label)
+            self.loading_label.deleteLater()
+            self.loading_label = None
+        self.main_layout.addWidget(self.invoice_form)
+        self.form_ready.emit()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._painted:
+            self._painted = True
+            self.first_paint.emit()
+            if self.invoice_form is None:
+                QTimer.singleShot(0, self.load_form) 
\ No newline at end of file
@@ -0,0 +1,58 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from ..calculations.money import format_amount
+from ..utils.worksheet_pdf import get_month_columns
+
+class InvoicePreviewModel(QAbstractTableModel):
+    """Read-only device x month table over invoice_data for the preview
+
+    Rows are the invoice_data dicts themselves; cells are formatted only
+    when the view asks for them, so only visible rows cost anything.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._month_columns = []
+        self._headers = []
+
+    def set_invoice_data(self, invoice_data):
+        self.beginResetModel()
+        self._rows = invoice_data or []
+        self._month_columns = get_month_columns(self._rows)
+        self._headers = (["Device ID", "Capacity (MW)"]
+                         + [label.capitalize() for label, _ in self._month_columns]
+                         + ["Total"])
+        self.endResetModel()
+
+    def clear(self):
+        self.set_invoice_data([])
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return row['Device ID']
+            if column == 1:
+                return format_amount(row['Capacity'], 2)
+            if column == len(self._headers) - 1:
+                return format_amount(row['TotalIssued'])
+            return format_amount(row.get(self._month_columns[column - 2][1]))
+        if role == Qt.TextAlignmentRole and column > 0:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        if role == Qt.ToolTipRole and column == 0:
+            return row.get('Project')
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self._headers[section]
+        return super().headerData(section, orientation, role)
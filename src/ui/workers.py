@@ -0,0 +1,124 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+import threading
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class WorkerSignals(QObject):
+    """Signals emitted by a Worker, delivered on the GUI thread"""
+    result = pyqtSignal(object)
+    error = pyqtSignal(object)
+    progress = pyqtSignal(int, str)
+    finished = pyqtSignal()
+
+class Worker(QRunnable):
+    """Run a blocking function on the thread pool
+
+    Results and errors of a cancelled worker are dropped, so a stale task
+    never overwrites newer state in the form. The function itself cannot be
+    interrupted mid-query; long running functions can check is_cancelled
+    between steps when they are given the progress callback.
+    """
+
+    def __init__(self, fn, *args, with_progress=False, cancellable=True, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cancellable = cancellable
+        self.signals = WorkerSignals()
+        self._cancelled = threading.Event()
+        if with_progress:
+            self.kwargs['progress'] = self.report_progress
+
+    def cancel(self):
+        if self.cancellable:
+            self._cancelled.set()
+
+    @property
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def report_progress(self, percent, message=""):
+        """Progress callback handed to the function; returns False once cancelled"""
+        if not self.is_cancelled:
+            self.signals.progress.emit(percent, message)
+        return not self.is_cancelled
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            logger.error(f"Background task failed: {str(e)}")
+            if not self.is_cancelled:
+                self.signals.error.emit(e)
+        else:
+            if not self.is_cancelled:
+                self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+class TaskRunner(QObject):
+    """Named background tasks for a widget, with a busy state for indicators
+
+    Starting a task cancels the running task of the same name, so only the
+    latest request (e.g. the last selected company) delivers its result.
+    """
+    busy_changed = pyqtSignal(bool)
+    progress = pyqtSignal(int, str)
+
+    def __init__(self, parent=None, pool=None):
+        super().__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self._active = {}
+
+    def run(self, name, fn, *args, on_result=None, on_error=None, message="",
+            with_progress=False, cancellable=True, **kwargs):
+        """Start fn(*args, **kwargs) in the background and return its Worker"""
+        previous = self._active.get(name)
+        if previous is not None:
+            previous.cancel()
+
+        worker = Worker(fn, *args, with_progress=with_progress, cancellable=cancellable, **kwargs)
+        if on_result is not None:
+            worker.signals.result.connect(on_result)
+        if on_error is not None:
+            worker.signals.error.connect(on_error)
+        worker.signals.progress.connect(self.progress)
+        worker.signals.finished.connect(lambda: self._on_finished(name, worker))
+
+        was_busy = self.is_busy()
+        self._active[name] = worker
+        if not was_busy:
+            self.busy_changed.emit(True)
+        self.progress.emit(0, message)
+        self.pool.start(worker)
+        return worker
+
+    def cancel(self, name=None):
+        """Cancel one task by name, or every cancellable task"""
+        names = [name] if name is not None else list(self._active)
+        for task_name in names:
+            worker = self._active.get(task_name)
+            if worker is not None and worker.cancellable:
+                worker.cancel()
+                # Forget it now so the busy state clears without waiting for the query
+                del self._active[task_name]
+        if not self.is_busy():
+            self.busy_changed.emit(False)
+
+    def can_cancel(self):
+        return bool(self._active) and all(worker.cancellable for worker in self._active.values())
+
+    def is_running(self, name):
+        return name in self._active
+
+    def is_busy(self):
+        return bool(self._active)
+
+    def _on_finished(self, name, worker):
+        if self._active.get(name) is worker:
+            del self._active[name]
+            if not self.is_busy():
+                self.busy_changed.emit(False)
@@ -1,31 +1,154 @@
 import os
-from openpyxl import load_workbook
+import re
+import zipfile
 from datetime import datetime
+from functools import lru_cache
+from xml.sax.saxutils import escape
 from .number_to_words import convert_to_words
+from ..calculations.money import WORDS_PLACES, format_amount, gst_breakdown, quantize
+
+CALC_CHAIN_PART = 'xl/calcChain.xml'
+
+_CELL_RE = re.compile(r'<c r="([A-Z]+[0-9]+)"([^>]*?)(?:/>|>.*?</c>)', re.S)
+_STYLE_RE = re.compile(r'\bs="([0-9]+)"')
+_MERGE_RE = re.compile(r'<mergeCell ref="([A-Z]+[0-9]+):([A-Z]+[0-9]+)"/>')
+_REF_RE = re.compile(r'^([A-Z]+)([0-9]+)$')
+
+def column_letters(column):
+    """Convert a column number to letters, e.g. 3 -> 'C'"""
+    letters = ''
+    while column:
+        column, remainder = divmod(column - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def split_cell_ref(cell_ref):
+    """Split 'C31' into (column number, row number)"""
+    match = _REF_RE.match(cell_ref)
+    if not match:
+        raise ValueError(f"Invalid cell reference: {cell_ref!r}")
+    column = 0
+    for letter in match.group(1):
+        column = column * 26 + ord(letter) - 64
+    return column, int(match.group(2))
+
+class InvoiceTemplate:
+    """Preparsed xlsx template that renders invoices by patching the sheet XML
+
+    The template is read once: its zip parts are kept as immutable bytes and
+    the cells of the first worksheet are indexed by coordinate. Rendering an
+    invoice splices the written cells into the master sheet XML and writes a
+    new zip, without building an openpyxl workbook. The calculation chain is
+    dropped (as openpyxl does on save) and a full recalculation is requested
+    on open, because written cells replace template formulas.
+    """
+
+    def __init__(self, template_path):
+        self.template_path = template_path
+        with zipfile.ZipFile(template_path) as archive:
+            parts = [(info.filename, archive.read(info.filename)) for info in archive.infolist()]
+
+        self.sheet_part = self._find_first_sheet(dict(parts))
+        static_parts = []
+        for name, data in parts:
+            if name == CALC_CHAIN_PART:
+                continue
+            if name == self.sheet_part:
+                self.sheet_xml = data.decode('utf-8')
+                continue
+            if name == '[Content_Types].xml':
+                data = re.sub(rb'<Override PartName="/xl/calcChain.xml"[^>]*/>', b'', data)
+            elif name == 'xl/_rels/workbook.xml.rels':
+                data = re.sub(rb'<Relationship [^>]*Target="calcChain.xml"/>', b'', data)
+            elif name == 'xl/workbook.xml':
+                data = re.sub(rb'<calcPr([^>]*?)/>', rb'<calcPr\1 fullCalcOnLoad="1"/>', data, count=1)
+            static_parts.append((name, data))
+        self.static_parts = tuple(static_parts)
+
+        # Coordinate -> (start, end, style) of each cell element in the sheet XML
+        self.cells = {}
+        for match in _CELL_RE.finditer(self.sheet_xml):
+            style = _STYLE_RE.search(match.group(2))
+            self.cells[match.group(1)] = (match.start(), match.end(), style.group(1) if style else None)
+
+        # Coordinate -> writable cell: itself, or the anchor of its merged range
+        self.targets = {cell_ref: cell_ref for cell_ref in self.cells}
+        for first, last in _MERGE_RE.findall(self.sheet_xml):
+            min_col, min_row = split_cell_ref(first)
+            max_col, max_row = split_cell_ref(last)
+            for column in range(min_col, max_col + 1):
+                for row in range(min_row, max_row + 1):
+                    self.targets[f"{column_letters(column)}{row}"] = first
+
+    def resolve(self, cell_ref):
+        """Return the writable cell for cell_ref, raising ValueError for unknown references"""
+        target = self.targets.get(cell_ref)
+        if target is None:
+            split_cell_ref(cell_ref)  # Raises for malformed references
+            raise ValueError(f"Cell {cell_ref} does not exist in template {self.template_path}")
+        if target not in self.cells:
+            raise ValueError(f"Merged range anchor {target} for cell {cell_ref} does not exist in template {self.template_path}")
+        return target
+
+    @staticmethod
+    def _find_first_sheet(parts):
+        """Resolve the part name of the workbook's first worksheet"""
+        workbook = parts['xl/workbook.xml'].decode('utf-8')
+        rels = parts['xl/_rels/workbook.xml.rels'].decode('utf-8')
+        rel_id = re.search(r'<sheet [^>]*r:id="([^"]+)"', workbook).group(1)
+        target = re.search(r'<Relationship [^>]*Id="' + re.escape(rel_id) + r'"[^>]*Target="([^"]+)"', rels)
+        if target is None:
+            target = re.search(r'<Relationship [^>]*Target="([^"]+)"[^>]*Id="' + re.escape(rel_id) + r'"', rels)
+        target = target.group(1)
+        return target.lstrip('/') if target.startswith('/') else 'xl/' + target
+
+    @staticmethod
+    def _cell_xml(cell_ref, style, value):
+        style_attr = f' s="{style}"' if style is not None else ''
+        if value is None:
+            return f'<c r="{cell_ref}"{style_attr}/>'
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return f'<c r="{cell_ref}"{style_attr}><v>{value!r}</v></c>'
+        text = escape(str(value))
+        return f'<c r="{cell_ref}"{style_attr} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+    def render_sheet(self, values):
+        """Return the sheet XML with the given cell values patched in"""
+        pieces = []
+        position = 0
+        for cell_ref in sorted(values, key=lambda ref: self.cells[ref][0]):
+            start, end, style = self.cells[cell_ref]
+            pieces.append(self.sheet_xml[position:start])
+            pieces.append(self._cell_xml(cell_ref, style, values[cell_ref]))
+            position = end
+        pieces.append(self.sheet_xml[position:])
+        return ''.join(pieces)
+
+    def save(self, values, output_path):
+        """Write a copy of the template with the given cell values to output_path"""
+        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, data in self.static_parts:
+                archive.writestr(name, data)
+            archive.writestr(self.sheet_part, self.render_sheet(values).encode('utf-8'))
+
+@lru_cache(maxsize=None)
+def load_invoice_template(template_path):
+    """Load and preparse a template once per process"""
+    return InvoiceTemplate(os.path.abspath(template_path))
 
 class ExcelInvoiceGenerator:
     def __init__(self, template_path):
         self.template_path = template_path
-        self.workbook = None
-        self.worksheet = None
+        self.template = None
+        self.values = {}
 
     def load_template(self):
-        self.workbook = load_workbook(self.template_path)
-        self.worksheet = self.workbook.active
+        self.template = load_invoice_template(self.template_path)
+        self.values = {}
 
     def write_value(self, cell_ref, value):
-        """Write value directly to worksheet"""
-        try:
-            self.worksheet[cell_ref].value = value
-        except:
-            # If direct assignment fails, try writing to the first cell of the merged range
-            cell = self.worksheet[cell_ref]
-            if cell.parent.merged_cells:
-                for merged_range in cell.parent.merged_cells.ranges:
-                    if cell.coordinate in merged_range:
-                        min_col, min_row, max_col, max_row = merged_range.bounds
-                        self.worksheet.cell(row=min_row, column=min_col).value = value
-                        break
+        """Write value to a cell, or to the first cell of the merged range containing it"""
+        self.values[self.template.resolve(cell_ref)] = value
 
     def generate_invoice(self, data, calculations):
         self.load_template()
@@ -48,10 +171,10 @@ class ExcelInvoiceGenerator:
             # Date and period
             current_date = datetime.now().strftime("%d-%m-%Y")
             self.write_value('K9', f"Date of Invoice: {current_date}")
-            
-            # Format period dates with selected year
+
+            # Format period dates with the selected years; the period may end in a later year
             from_date = datetime.strptime(f"{data['period_from']} {data['year']}", "%B %Y").strftime("01-%m-%Y")
-            to_date = datetime.strptime(f"{data['period_to']} {data['year']}", "%B %Y").strftime("31-%m-%Y")
+            to_date = datetime.strptime(f"{data['period_to']} {data.get('year_to') or data['year']}", "%B %Y").strftime("31-%m-%Y")
             self.write_value('H20', f"{from_date} to {to_date}")
 
             # Project details - handle multiple projects with proper formatting
@@ -68,24 +191,22 @@ class ExcelInvoiceGenerator:
             # Calculations
             total_issued = calculations['total_issued']
             net_rate = calculations['net_rate']
-            calc_value = float((total_issued * net_rate))
-            calc_value_with_rate = float((calc_value * 0.09))
-            total_invoice_value = float((calc_value + 2 * calc_value_with_rate))
+            calc_value, cgst, sgst, total_invoice_value = gst_breakdown(total_issued, net_rate)
 
             # Invoice details
-            self.write_value('C31', f"Sale of renewable attributes for I-REC ({total_issued:.4f} units at INR {net_rate:.4f} per unit)")
-            self.write_value('G31', f"{calc_value:.4f}")
-            self.write_value('I31', f"{calc_value_with_rate:.4f}")
-            self.write_value('K31', f"{calc_value_with_rate:.4f}")
-            
+            self.write_value('C31', f"Sale of renewable attributes for I-REC ({format_amount(total_issued)} units at INR {format_amount(net_rate)} per unit)")
+            self.write_value('G31', format_amount(calc_value))
+            self.write_value('I31', format_amount(cgst))
+            self.write_value('K31', format_amount(sgst))
+
             # Totals
-            self.write_value('G37', f"{calc_value:.4f}")
-            self.write_value('I37', f"{calc_value_with_rate:.4f}")
-            self.write_value('K37', f"{calc_value_with_rate:.4f}")
-            self.write_value('O38', f"{total_invoice_value:.4f}")
+            self.write_value('G37', format_amount(calc_value))
+            self.write_value('I37', format_amount(cgst))
+            self.write_value('K37', format_amount(sgst))
+            self.write_value('O38', format_amount(total_invoice_value))
 
             # Amount in words
-            self.write_value('G40', convert_to_words(total_invoice_value))
+            self.write_value('G40', convert_to_words(quantize(total_invoice_value, WORDS_PLACES)))
 
         except Exception as e:
             print(f"Error in generate_invoice: {str(e)}")
@@ -93,7 +214,7 @@ class ExcelInvoiceGenerator:
 
     def save(self, output_path):
         try:
-            self.workbook.save(output_path)
+            self.template.save(self.values, output_path)
         except Exception as e:
             print(f"Error saving workbook: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
@@ -0,0 +1,62 @@
+import os
+from datetime import datetime
+
+def get_project_text(invoice_data):
+    """Join the distinct projects of the invoiced devices"""
+    projects = list(set(device['Project'] for device in invoice_data))
+    return ' and '.join(projects)
+
+def build_invoice_record(invoice_id, group_name, company_name, seller_info, calculations,
+                         device_ids, unregistered_devices, unit_price, usd_rate, eur_rate,
+                         year, period_from, period_to, project_text, year_to=None):
+    """Build the invoicedata row for a generated invoice; year_to is the period's end year (default: year)"""
+    year_to = year if year_to is None else year_to
+    return {
+        'invoiceid': invoice_id,
+        'groupName': group_name,
+        'capacity': calculations['capacity'],
+        'regNo': len(device_ids),  # Total number of devices
+        'regdevice': ','.join(unregistered_devices),  # Only unregistered devices
+        'issued': calculations['total_issued'],
+        'ISP': unit_price,
+        'registrationFee': calculations['registration_fee'],
+        'issuanceFee': calculations['issuance_fee'],
+        'USDExchange': usd_rate,
+        'EURExchange': eur_rate,
+        'invoicePeriodFrom': f"01-{datetime.strptime(period_from, '%B').strftime('%m')}-{year}",
+        'invoicePeriodTo': f"31-{datetime.strptime(period_to, '%B').strftime('%m')}-{year_to}",
+        'gross': calculations['gross_amount'],
+        'regFeeINR': calculations['reg_fee_inr'],
+        'issuanceINR': calculations['issuance_fee_inr'],
+        'netRevenue': calculations['net_revenue'],
+        'successFee': calculations['success_fee'],
+        'finalRevenue': calculations['final_revenue'],
+        'project': project_text,
+        'netRate': calculations['net_rate'],
+        'pan': seller_info['pan'],
+        'gst': seller_info['gst'],
+        'address': seller_info['address'],
+        'date': datetime.now().strftime("%d-%m-%Y"),
+        'deviceIds': ','.join(device_ids),
+        'companyName': company_name
+    }
+
+def build_excel_data(company_name, seller_info, period_from, period_to, project_text, year, year_to=None):
+    """Build the data dict consumed by ExcelInvoiceGenerator"""
+    return {
+        'company_name': company_name,
+        'pan': seller_info['pan'],
+        'gst': seller_info['gst'],
+        'address': seller_info['address'],
+        'period_from': period_from,
+        'period_to': period_to,
+        'project': project_text,
+        'year': year,
+        'year_to': year if year_to is None else year_to
+    }
+
+def get_output_dir(base_dir, kind, group_name, company_name, year):
+    """Create and return the <kind>/<group>/<company>/<year> output directory"""
+    output_dir = os.path.join(base_dir, kind, group_name, company_name, str(year))
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
@@ -0,0 +1,72 @@
+"""
+Parallel rendering stage for fully calculated invoices.
+
+Each job is a plain dict, so it can be pickled to a worker process:
+
+    {
+        'group_name': ..., 'company_name': ..., 'year': ...,
+        'excel_data': {...},      # as built by build_excel_data
+        'calculations': {...},    # as returned by InvoiceCalculator
+        'invoice_data': [...],    # optional: device rows, to also write the worksheet PDF
+    }
+
+Rendering is CPU-bound pure Python, so jobs are spread over a process pool.
+Results are returned in job order regardless of completion order.
+"""
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from .excel_handler import ExcelInvoiceGenerator
+from .invoice_payload import get_output_dir
+from .worksheet_pdf import generate_worksheet_pdf
+
+logger = logging.getLogger(__name__)
+
+def render_invoice_job(job, template_path, output_root):
+    """Render one invoice job; failures are reported in the result instead of raised"""
+    result = {
+        'group_name': job['group_name'],
+        'company_name': job['company_name'],
+        'status': 'ok',
+        'path': None,
+        'worksheet_path': None,
+    }
+    try:
+        invoice_base_dir = get_output_dir(output_root, "Invoices", job['group_name'], job['company_name'], job['year'])
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_path = os.path.join(invoice_base_dir, job.get('filename') or f"invoice_{timestamp}.xlsx")
+
+        excel_generator = ExcelInvoiceGenerator(template_path)
+        excel_generator.generate_invoice(job['excel_data'], job['calculations'])
+        excel_generator.save(output_path)
+        result['path'] = output_path
+
+        if job.get('invoice_data'):
+            worksheet_base_dir = get_output_dir(output_root, "Worksheet", job['group_name'], job['company_name'], job['year'])
+            worksheet_path = os.path.join(worksheet_base_dir, f"invoice_worksheet_{timestamp}.pdf")
+            generate_worksheet_pdf(worksheet_path, job['group_name'], job['company_name'],
+                                   job['invoice_data'], job['calculations'])
+            result['worksheet_path'] = worksheet_path
+    except Exception as e:
+        result.update({'status': 'failed', 'reason': str(e)})
+    return result
+
+def render_invoices(jobs, template_path, output_root=None, workers=None):
+    """Render invoice jobs across a process pool and return results in job order"""
+    jobs = list(jobs)
+    if not jobs:
+        return []
+    output_root = output_root or os.getcwd()
+
+    if workers == 1 or len(jobs) == 1:
+        results = [render_invoice_job(job, template_path, output_root) for job in jobs]
+    else:
+        # Each worker process parses the template once and reuses it for its jobs
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(render_invoice_job, job, template_path, output_root) for job in jobs]
+            results = [future.result() for future in futures]
+
+    failed = sum(1 for result in results if result['status'] != 'ok')
+    logger.info(f"Rendered {len(results) - failed} of {len(results)} invoices")
+    return results
@@ -0,0 +1,25 @@
+import ast
+import json
+from functools import lru_cache
+
+@lru_cache(maxsize=4096)
+def parse_issue_process(raw):
+    """Parse an inventory2 issue_process payload into a tuple of issued values
+
+    Payloads are list literals such as "[120.5, 80.25]". JSON is tried first
+    as the fast path, with ast.literal_eval as a safe fallback for Python
+    literal spellings. Anything that is not a list parses as empty. The
+    result is a tuple so cached values can be shared between rows.
+    """
+    if not raw:
+        return ()
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        try:
+            value = ast.literal_eval(raw)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            return ()
+    if not isinstance(value, (list, tuple)):
+        return ()
+    return tuple(value)
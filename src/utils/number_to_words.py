@@ -1,35 +1,58 @@
-def convert_to_words(amount):
-    crore = 10000000
-    lakh = 100000
-    thousand = 1000
-    hundred = 100
-
-    units = ["", "ONE", "TWO", "THREE", "FOUR", "FIVE", "SIX", "SEVEN", "EIGHT", "NINE", "TEN", 
-             "ELEVEN", "TWELVE", "THIRTEEN", "FOURTEEN", "FIFTEEN", "SIXTEEN", "SEVENTEEN", "EIGHTEEN", "NINETEEN"]
-    tens = ["", "", "TWENTY", "THIRTY", "FORTY", "FIFTY", "SIXTY", "SEVENTY", "EIGHTY", "NINETY"]
-
-    def convert_number_to_words(num):
-        if num < 20:
-            return units[num]
-        if num < 100:
-            return tens[num // 10] + (" " + units[num % 10] if num % 10 != 0 else "")
-        if num < thousand:
-            return units[num // hundred] + " HUNDRED" + (" AND " + convert_number_to_words(num % hundred) if num % hundred != 0 else "")
-        if num < lakh:
-            return convert_number_to_words(num // thousand) + " THOUSAND" + (" " + convert_number_to_words(num % thousand) if num % thousand != 0 else "")
-        if num < crore:
-            return convert_number_to_words(num // lakh) + " LAKH" + (" " + convert_number_to_words(num % lakh) if num % lakh != 0 else "")
-        return convert_number_to_words(num // crore) + " CRORE" + (" " + convert_number_to_words(num % crore) if num % crore != 0 else "")
+from functools import lru_cache
+
+CRORE = 10000000
+LAKH = 100000
+THOUSAND = 1000
+HUNDRED = 100
+
+UNITS = ("", "ONE", "TWO", "THREE", "FOUR", "FIVE", "SIX", "SEVEN", "EIGHT", "NINE", "TEN",
+         "ELEVEN", "TWELVE", "THIRTEEN", "FOURTEEN", "FIFTEEN", "SIXTEEN", "SEVENTEEN", "EIGHTEEN", "NINETEEN")
+TENS = ("", "", "TWENTY", "THIRTY", "FORTY", "FIFTY", "SIXTY", "SEVENTY", "EIGHTY", "NINETY")
+
+# Words for 0-99, built once
+TWO_DIGIT_WORDS = tuple(
+    UNITS[num] if num < 20 else TENS[num // 10] + (" " + UNITS[num % 10] if num % 10 != 0 else "")
+    for num in range(100)
+)
+
+@lru_cache(maxsize=THOUSAND)
+def convert_chunk(num):
+    """Words for 0-999"""
+    if num < HUNDRED:
+        return TWO_DIGIT_WORDS[num]
+    remainder = num % HUNDRED
+    return UNITS[num // HUNDRED] + " HUNDRED" + (" AND " + TWO_DIGIT_WORDS[remainder] if remainder != 0 else "")
 
+def convert_number_to_words(num):
+    """Words for a whole number in the Indian system (crore, lakh, thousand)"""
+    parts = []
+    crores, num = divmod(num, CRORE)
+    if crores:
+        parts.append(convert_number_to_words(crores) + " CRORE")
+    lakhs, num = divmod(num, LAKH)
+    if lakhs:
+        parts.append(TWO_DIGIT_WORDS[lakhs] + " LAKH")
+    thousands, num = divmod(num, THOUSAND)
+    if thousands:
+        parts.append(TWO_DIGIT_WORDS[thousands] + " THOUSAND")
+    if num:
+        parts.append(convert_chunk(num))
+    return " ".join(parts)
+
+def convert_to_words(amount):
     # Format the amount to ensure 2 decimal places
     amount_str = "{:.2f}".format(float(amount))
     rupees, paise = amount_str.split('.')
-    
+
     result = convert_number_to_words(int(rupees))
     result += " RUPEES"
 
     paise_val = int(paise)
     if paise_val > 0:
-        result += " AND " + convert_number_to_words(paise_val) + " PAISE"
+        result += " AND " + TWO_DIGIT_WORDS[paise_val] + " PAISE"
+
+    return result + " ONLY"
 
-    return result + " ONLY" 
\ No newline at end of file
+def convert_many(amounts):
+    """Convert a batch of amounts, e.g. every invoice total of a batch run"""
+    return [convert_to_words(amount) for amount in amounts]
@@ -0,0 +1,153 @@
+import re
+from functools import lru_cache
+
+# reportlab is imported on first use, so importing this module does not slow down startup
+
+_MONTH_KEY_RE = re.compile(r'^([a-z]+)([0-9]{4})Issued$')
+
+MONTH_ORDER = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+
+@lru_cache(maxsize=None)
+def get_worksheet_styles():
+    """Build the paragraph and table styles once and share them across documents"""
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        spaceAfter=30,
+        alignment=1  # Center alignment
+    )
+    summary_table_style = TableStyle([
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),  # Header row
+        ('BACKGROUND', (0, 5), (-1, 5), colors.lightgrey),  # Fees header
+        ('BACKGROUND', (0, 11), (-1, 11), colors.lightgrey),  # Revenue header
+        ('PADDING', (0, 0), (-1, -1), 6),
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),  # Right align all values in second column
+    ])
+    details_table_style = TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('PADDING', (0, 0), (-1, -1), 1),
+        ('FONTSIZE', (0, 0), (-1, -1), 5),
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('TOPPADDING', (0, 0), (-1, -1), 0),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+        ('LEFTPADDING', (0, 0), (-1, -1), 2),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 2),
+    ])
+    return styles, title_style, summary_table_style, details_table_style
+
+def get_month_columns(invoice_data):
+    """Map the invoice rows' {month}{year}Issued keys to chronologically sorted (label, key) columns
+
+    Labels are lowercase 3-letter month abbreviations, with the year added
+    when the period spans more than one year (e.g. "mar'24").
+    """
+    if not invoice_data:
+        return []
+    months = []
+    for key in invoice_data[0].keys():
+        match = _MONTH_KEY_RE.match(key)
+        if match:
+            month, year = match.group(1)[:3], int(match.group(2))
+            months.append((year, MONTH_ORDER[month], month, key))
+    months.sort()  # Sort months chronologically
+    multi_year = len({year for year, _, _, _ in months}) > 1
+    return [
+        (f"{month}'{year % 100:02d}" if multi_year else month, key)
+        for year, _, month, key in months
+    ]
+
+def generate_worksheet_pdf(filepath, group_name, company_name, invoice_data, calculations):
+    """Generate the PDF worksheet for an invoice from plain data"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer
+    from reportlab.lib.units import inch
+
+    doc = SimpleDocTemplate(filepath, pagesize=letter, leftMargin=15, rightMargin=15)  # Reduced margins
+    styles, title_style, summary_table_style, details_table_style = get_worksheet_styles()
+    elements = []
+
+    # Title with group and company name
+    elements.append(Paragraph(f"{group_name} - {company_name}", title_style))
+
+    # Create one main table for all data
+    table_data = []
+
+    # Device Information section
+    table_data.extend([
+        [Paragraph("<b>Device Information</b>", styles['Heading2']), ""],
+        ["Total Devices", str(calculations['total_devices'])],
+        ["Total Capacity (MW)", f"{calculations['capacity']:.2f}"],
+        ["Total Issued", f"{calculations['total_issued']:.4f}"],
+        ["", ""],  # Empty row for spacing
+    ])
+
+    # Fees section
+    table_data.extend([
+        [Paragraph("<b>Fees</b>", styles['Heading2']), ""],
+        ["Registration Fee (EUR)", f"{calculations['registration_fee']:.2f}"],
+        ["Registration Fee (INR)", f"{calculations['reg_fee_inr']:.4f}"],
+        ["Issuance Fee (EUR)", f"{calculations['issuance_fee']:.4f}"],
+        ["Issuance Fee (INR)", f"{calculations['issuance_fee_inr']:.4f}"],
+        ["", ""],  # Empty row for spacing
+    ])
+
+    # Revenue Calculations section
+    table_data.extend([
+        [Paragraph("<b>Revenue Calculations</b>", styles['Heading2']), ""],
+        ["Gross Amount (INR)", f"{calculations['gross_amount']:.4f}"],
+        ["Net Revenue (INR)", f"{calculations['net_revenue']:.4f}"],
+        ["Success Fee (INR)", f"{calculations['success_fee']:.4f}"],
+        ["Final Revenue (INR)", f"{calculations['final_revenue']:.4f}"],
+        ["Net Rate", f"{calculations['net_rate']:.4f}"],
+        ["", ""],  # Empty row for spacing
+    ])
+
+    # Create the main table
+    main_table = Table(table_data, colWidths=[4*inch, 3*inch])
+    main_table.setStyle(summary_table_style)
+    elements.append(main_table)
+    elements.append(Spacer(1, 20))
+
+    # Device Details with Monthly Issuance
+    elements.append(Paragraph("<b>Device Details</b>", styles['Heading2']))
+
+    # Month columns are resolved once for the whole document
+    month_columns = get_month_columns(invoice_data)
+
+    # Create headers for the table
+    headers = ["Device ID"] + [label for label, _ in month_columns] + ["Tot"]
+    device_details = [headers]
+
+    # Add data for each device
+    for device in invoice_data:
+        row = [device['Device ID']]
+        for _, month_key in month_columns:
+            value = device.get(month_key, 0)
+            row.append(f"{float(value):.2f}" if value else "0.00")
+        row.append(f"{float(device['TotalIssued']):.2f}")
+        device_details.append(row)
+
+    # Calculate column widths based on number of columns
+    total_width = 7.8  # Total width in inches
+    device_id_width = 1.3  # Device ID column width
+    remaining_width = total_width - device_id_width
+    month_width = remaining_width / (len(month_columns) + 1)  # +1 for Total column
+    col_widths = [device_id_width] + [month_width] * (len(month_columns) + 1)
+
+    details_table = Table(device_details, colWidths=[w*inch for w in col_widths])
+    details_table.setStyle(details_table_style)
+    elements.append(details_table)
+
+    # Build PDF
+    doc.build(elements)